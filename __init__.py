@@ -1,7 +1,29 @@
-from features.cqt_features import cqt_features
-from features.gammatonegram import gammatonegram
-from features.melspectrogram import melspectrogram
-from features.mfcc_features import extract_mfcc_1d
-from features.stft_features import stft_features
-from features.wst_features import wst_features
-from preprocessing.preprocessing import process_file, process_dataset_parallel, process_dataset_sequential
\ No newline at end of file
+import importlib
+
+# Public name -> module defining it. Modules are imported on first attribute access (PEP 562),
+# so importing the package does not load librosa, torch, kymatio or nnAudio2, and a missing
+# optional backend only affects the names that need it.
+_LAZY_ATTRIBUTES = {
+    "cqt_features": "features.cqt_features",
+    "gammatonegram": "features.gammatonegram",
+    "melspectrogram": "features.melspectrogram",
+    "extract_mfcc_1d": "features.mfcc_features",
+    "stft_features": "features.stft_features",
+    "wst_features": "features.wst_features",
+    "process_file": "preprocessing.preprocessing",
+    "process_dataset_parallel": "preprocessing.preprocessing",
+    "process_dataset_sequential": "preprocessing.preprocessing",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,82 @@
+"""
+Size and read throughput of every on-disk feature encoding (see `processing.FeatureEncoding`)
+against the plain `.npy` output, per feature mode, on synthetic recordings. Also reports the
+largest absolute decoding error, in the feature's own units (dB for the log-scaled modes).
+
+Run from the repository root:
+    python -m benchmarks.encoding_benchmark --modes melspectrogram stft --json encodings.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+from benchmarks.synthetic import write_synthetic_dataset
+from preprocessing.engine import FEATURE_EXTRACTORS
+from processing.FeatureEncoding import ENCODINGS, feature_extension, load_features, save_features
+
+def bench_encoding(features, output_dir, encoding, compress, repeats=3):
+    """Bytes on disk, best-of-`repeats` read throughput and max abs error of one encoding."""
+    extension = feature_extension(encoding, compress)
+    paths = []
+    start = time.perf_counter()
+    for i, feature in enumerate(features):
+        paths.append(save_features(os.path.join(output_dir, f"{i}{extension}"), feature, encoding, compress))
+    write_seconds = time.perf_counter() - start
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+
+    read_seconds = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        decoded = [load_features(path) for path in paths]
+        read_seconds = min(read_seconds, time.perf_counter() - start)
+    error = max(float(np.max(np.abs(d.astype(np.float64) - f))) for d, f in zip(decoded, features))
+    return {
+        "bytes": total_bytes,
+        "write_files_per_sec": len(paths) / write_seconds,
+        "read_files_per_sec": len(paths) / read_seconds,
+        "read_mb_per_sec": total_bytes / read_seconds / 1e6,
+        "max_abs_error": error,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["melspectrogram", "stft", "mfcc", "cqt"])
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=4.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_files = write_synthetic_dataset(os.path.join(tmp, "wav"), n_files=args.files, duration=args.duration)
+        for mode in args.modes:
+            features = [FEATURE_EXTRACTORS[mode](path) for path in wav_files]
+            results[mode] = {}
+            baseline = None
+            print(f"\n{mode} ({features[0].dtype}, shape {features[0].shape})")
+            print(f"{'encoding':<22}{'size (KB)':>11}{'vs .npy':>9}{'read files/s':>14}{'read MB/s':>11}{'max error':>12}")
+            for encoding in ENCODINGS:
+                for compress in (False, True):
+                    name = f"{encoding or 'native'}{'+deflate' if compress else ''}"
+                    output_dir = os.path.join(tmp, mode, name)
+                    os.makedirs(output_dir)
+                    result = bench_encoding(features, output_dir, encoding, compress, args.repeats)
+                    if baseline is None:
+                        baseline = result["bytes"]
+                    result["size_ratio"] = result["bytes"] / baseline
+                    results[mode][name] = result
+                    print(f"{name:<22}{result['bytes'] / 1024:>11.0f}{result['size_ratio']:>9.2f}"
+                          f"{result['read_files_per_sec']:>14.0f}{result['read_mb_per_sec']:>11.1f}"
+                          f"{result['max_abs_error']:>12.4g}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version, "numpy": np.__version__, "files": args.files,
+                       "duration_s": args.duration, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Import time of the package entry points, and start-up time of each feature mode (import plus a
+first call on a 1 s clip), each measured in a fresh interpreter, together with the heavy
+backends that were loaded.
+
+Run from the repository root:
+    python -m benchmarks.import_benchmark --repeats 5 --json imports.json
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKENDS = ("librosa.core", "numba", "scipy", "torch", "kymatio", "nnAudio2")
+MODES = ("melspectrogram", "gammatonegram", "mfcc", "stft", "wst", "cqt")
+
+# target -> statement timed in the child interpreter
+TARGETS = {
+    "package": "import importlib.util\n"
+               "spec = importlib.util.spec_from_file_location('package', os.path.join(ROOT, '__init__.py'))\n"
+               "spec.loader.exec_module(importlib.util.module_from_spec(spec))",
+    "preprocessing.engine": "import preprocessing.engine",
+    "preprocessing.preprocessing": "import preprocessing.preprocessing",
+}
+# Importing the engine and running one mode on a 1 s clip: the start-up cost of a worker
+# (or a short CLI run) that only computes that mode.
+TARGETS.update({f"mode:{mode}": "import numpy as np\n"
+                                "from preprocessing.engine import FEATURE_EXTRACTORS\n"
+                                f"FEATURE_EXTRACTORS[{mode!r}]((0.1 * np.random.default_rng(0).standard_normal(22050)"
+                                ".astype(np.float32), 22050))"
+                for mode in MODES})
+
+_CHILD = """
+import os, sys, time, json
+ROOT = {root!r}
+sys.path.insert(0, ROOT)
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {backends!r} if name in sys.modules]}}))
+"""
+
+def time_import(statement, repeats):
+    """Median seconds of `statement` over `repeats` fresh interpreters, and the backends it loaded."""
+    timings = []
+    loaded = []
+    for _ in range(repeats):
+        code = _CHILD.format(root=ROOT, statement=statement, backends=BACKENDS)
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT, check=True)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded = result["loaded"]
+    return float(np.median(timings)), loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS))
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'target':<30}{'import (ms)':>12}  backends loaded")
+    for target in args.targets:
+        try:
+            seconds, loaded = time_import(TARGETS[target], args.repeats)
+        except subprocess.CalledProcessError as e:
+            print(f"{target:<30}failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        results[target] = {"import_ms": 1e3 * seconds, "loaded": loaded}
+        print(f"{target:<30}{1e3 * seconds:>12.0f}  {', '.join(loaded) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Per-file cost of every feature mode with the transform kernels rebuilt for each clip (the old
+behaviour) versus reused from `features.kernels`.
+
+Run from the repository root:
+    python -m benchmarks.kernel_benchmark --duration 1.0 --repeats 20
+"""
+import argparse
+import json
+import time
+import numpy as np
+from features.kernels import clear_kernels
+from preprocessing.engine import FEATURE_EXTRACTORS
+
+# Rate each extractor works at; the synthetic clip is generated at that rate so only the transform is timed.
+MODE_RATES = {
+    "melspectrogram": 1.46 * 22050,
+    "cqt": 1.46 * 22050,
+    "mfcc": 22050,
+    "stft": 22050,
+    "wst": 22050,
+    "gammatonegram": None,
+}
+
+def time_mode(extractor, audio, repeats, rebuild):
+    """Returns the median seconds per call of `extractor(audio)`."""
+    extractor(audio)  # warm-up: imports, numba compilation, first kernel build
+    timings = []
+    for _ in range(repeats):
+        if rebuild:
+            clear_kernels()
+        start = time.perf_counter()
+        extractor(audio)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=1.0, help="clip length in seconds")
+    parser.add_argument("--sr", type=int, default=52734, help="native sampling rate, used by gammatonegram")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", default=list(FEATURE_EXTRACTORS))
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+
+    results = {}
+    print(f"{'mode':<16}{'rebuilt (ms)':>14}{'reused (ms)':>14}{'speedup':>10}")
+    for mode in args.modes:
+        extractor = FEATURE_EXTRACTORS[mode]
+        sr = MODE_RATES[mode] or args.sr
+        audio = ((0.1 * rng.standard_normal(int(args.duration * sr))).astype(np.float32), sr)
+        try:
+            rebuilt = time_mode(extractor, audio, args.repeats, rebuild=True)
+            reused = time_mode(extractor, audio, args.repeats, rebuild=False)
+        except Exception as e:
+            print(f"{mode:<16}failed: {type(e).__name__}: {e}")
+            continue
+        results[mode] = {"rebuilt_s": rebuilt, "reused_s": reused, "speedup": rebuilt / reused}
+        print(f"{mode:<16}{rebuilt * 1e3:>14.2f}{reused * 1e3:>14.2f}{rebuilt / reused:>9.2f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"duration": args.duration, "sr": args.sr, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
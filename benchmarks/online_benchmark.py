@@ -0,0 +1,95 @@
+"""
+Checks the online features of `processing.OnlineFeatureDataset` against the `features/`
+functions on synthetic recordings, and compares the throughput of online extraction (per item
+in the DataLoader, and on whole padded batches) with reading preprocessed `.npy` files.
+
+Run from the repository root:
+    python -m benchmarks.online_benchmark --files 64 --json online.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from benchmarks.synthetic import write_synthetic_dataset
+from preprocessing.engine import FEATURE_EXTRACTORS, extract_dataset
+from processing.LengthBucketSampler import LengthBucketSampler
+from processing.MelSpectrogramDataset import MelSpectrogramDataset
+from processing.OnlineFeatureDataset import OnlineFeatureDataset
+from processing.PadCollate import PadCollate
+
+def max_error(dataset, n_files):
+    """Largest absolute difference between the online features and the `features/` function of the mode."""
+    extractor = FEATURE_EXTRACTORS[dataset.extractor.mode]
+    error = 0.0
+    for idx in range(min(n_files, len(dataset))):
+        online = dataset[idx][0].numpy()
+        reference = np.asarray(extractor(dataset.file_paths[idx])).reshape(online.shape)
+        error = max(error, float(np.max(np.abs(online - reference))))
+    return error
+
+def clips_per_sec(loader, transform=None, epochs=2):
+    """Clips per second of the last of `epochs` passes over `loader` (the first one fills the audio cache)."""
+    for _ in range(epochs):
+        start = time.perf_counter()
+        n_clips = 0
+        for batch in loader:
+            if transform is not None:
+                transform(batch)
+            n_clips += len(batch[1])
+        elapsed = time.perf_counter() - start
+    return n_clips / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=64)
+    parser.add_argument("--modes", nargs="+", default=["melspectrogram", "stft", "gammatonegram"])
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--num-workers", type=int, default=0)
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_dir = os.path.join(tmp, "wav")
+        write_synthetic_dataset(wav_dir, n_files=args.files, duration=(1.0, 4.0))
+        print(f"{'mode':<16}{'max error':>11}{'npy clips/s':>13}{'online clips/s':>16}{'batched clips/s':>17}")
+        for mode in args.modes:
+            try:
+                online = OnlineFeatureDataset(wav_dir, mode)
+                error = max_error(online, 8)
+            except Exception as e:
+                print(f"{mode:<16}failed: {type(e).__name__}: {e}")
+                continue
+
+            npy_dir = os.path.join(tmp, mode)
+            extract_dataset(wav_dir, npy_dir, modes=[mode], max_workers=1, report_every=float("inf"), hooks=[])
+            offline = MelSpectrogramDataset(npy_dir)
+            loader_kwargs = dict(collate_fn=PadCollate(), num_workers=args.num_workers)
+            npy_rate = clips_per_sec(DataLoader(offline, batch_sampler=LengthBucketSampler(offline.lengths(), args.batch_size),
+                                                **loader_kwargs))
+            online_rate = clips_per_sec(DataLoader(online, batch_sampler=LengthBucketSampler(online.lengths(), args.batch_size),
+                                                   **loader_kwargs))
+
+            # Waveforms collated in the workers, features computed on the whole padded batch.
+            raw = OnlineFeatureDataset(wav_dir, mode, return_audio=True)
+            raw_loader = DataLoader(raw, batch_sampler=LengthBucketSampler(raw.lengths(), args.batch_size),
+                                    collate_fn=PadCollate(pad_value=0.0), num_workers=args.num_workers)
+            sr = raw.load_audio(0)[1]
+            with torch.no_grad():
+                batched_rate = clips_per_sec(raw_loader, lambda batch: raw.extractor(batch[0], batch[2], sr=sr))
+
+            results[mode] = {"max_abs_error": error, "npy_clips_per_sec": npy_rate,
+                             "online_clips_per_sec": online_rate, "batched_clips_per_sec": batched_rate}
+            print(f"{mode:<16}{error:>11.2g}{npy_rate:>13.0f}{online_rate:>16.0f}{batched_rate:>17.0f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version, "torch": torch.__version__, "files": args.files, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
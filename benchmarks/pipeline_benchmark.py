@@ -0,0 +1,217 @@
+"""
+End-to-end benchmark of the pipeline on synthetic recordings: every `process_file` mode split into
+decode, resample, transform and save, the parallel extraction engine, `MelSpectrogramDataset`
+iteration, `train_model` steps/sec and evaluation clips/sec.
+
+Run from the repository root:
+    python -m benchmarks.pipeline_benchmark --json results.json
+    python -m benchmarks.pipeline_benchmark --json new.json --baseline results.json --threshold 0.15
+
+With --baseline the run fails (exit status 1) if any timing got slower, or any throughput lower,
+than the baseline by more than the threshold.
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import numpy as np
+import librosa
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+from torchvision import models
+from benchmarks.kernel_benchmark import MODE_RATES
+from benchmarks.synthetic import write_synthetic_dataset
+from evaluation.engine import evaluate, prepare_model
+from models.resnet_model import ResNetAudio
+from preprocessing.engine import FEATURE_EXTRACTORS, extract_dataset
+from preprocessing.preprocessing import process_file
+from processing.MelSpectrogramDataset import MelSpectrogramDataset
+from processing.SliceBatchSampler import SliceBatchSampler
+from training.resnet_trainer import train_model
+
+def bench_stages(wav_files, mode, output_dir):
+    """Mean milliseconds per file of each stage of `process_file` for one mode, and of the whole call."""
+    extractor = FEATURE_EXTRACTORS[mode]
+    stages = {"decode": [], "resample": [], "transform": [], "save": []}
+    extractor(librosa.load(wav_files[0], sr=MODE_RATES[mode]))  # warm-up: imports, numba, kernel build
+    for i, path in enumerate(wav_files):
+        start = time.perf_counter()
+        y, native_sr = librosa.load(path, sr=None)
+        decoded = time.perf_counter()
+        sr = MODE_RATES[mode] or native_sr
+        if sr != native_sr:
+            y = librosa.resample(y, orig_sr=native_sr, target_sr=sr)
+        resampled = time.perf_counter()
+        spec = extractor((y, sr))
+        transformed = time.perf_counter()
+        np.save(os.path.join(output_dir, f"{mode}_{i}.npy"), spec)
+        saved = time.perf_counter()
+        stages["decode"].append(decoded - start)
+        stages["resample"].append(resampled - decoded)
+        stages["transform"].append(transformed - resampled)
+        stages["save"].append(saved - transformed)
+    result = {f"{stage}_ms": 1e3 * float(np.mean(timings)) for stage, timings in stages.items()}
+
+    input_folder = os.path.dirname(os.path.dirname(wav_files[0]))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path in wav_files:
+            process_file(path, input_folder, os.path.join(output_dir, "process_file"), mode=mode)
+    result["process_file_ms"] = 1e3 * (time.perf_counter() - start) / len(wav_files)
+    return result
+
+def bench_engine(wav_folder, output_folder, max_workers):
+    start = time.perf_counter()
+    results = extract_dataset(wav_folder, output_folder, modes=("melspectrogram",), max_workers=max_workers,
+                              incremental=False)
+    return {"files_per_sec": len(results) / (time.perf_counter() - start)}
+
+def _iterate(loader):
+    n = 0
+    start = time.perf_counter()
+    for inputs, _ in loader:
+        n += len(inputs)
+    return n / (time.perf_counter() - start)
+
+def bench_dataset(feature_folder, batch_size, epochs):
+    """Samples/sec of one epoch of `MelSpectrogramDataset`, file-backed and cached."""
+    dataset = MelSpectrogramDataset(feature_folder)
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+    files = [_iterate(loader) for _ in range(epochs)]
+    cached_dataset = MelSpectrogramDataset(feature_folder, cache=True)
+    cached_loader = DataLoader(cached_dataset, batch_size=None,
+                               sampler=SliceBatchSampler(len(cached_dataset), batch_size, shuffle=True))
+    first = _iterate(cached_loader)
+    cached = [_iterate(cached_loader) for _ in range(epochs)]
+    return {"files_samples_per_sec": float(np.median(files)), "cached_first_epoch_samples_per_sec": first,
+            "cached_samples_per_sec": float(np.median(cached))}, cached_dataset
+
+def bench_model(dataset, batch_size, bf16, output_dir):
+    """`train_model` steps/sec over one epoch and evaluation clips/sec and batch latency."""
+    samples = dataset.as_tensor().expand(-1, 3, -1, -1).contiguous()
+    loader = DataLoader(TensorDataset(samples, dataset.label_tensor), batch_size=batch_size)
+    torch.manual_seed(0)
+    model = ResNetAudio(models.resnet18(), len(dataset.classes))
+    with contextlib.redirect_stdout(io.StringIO()):
+        train_model(model, None, None, None, {"train": loader, "validation": loader},
+                    {"train": len(samples), "validation": len(samples)}, batch_size, num_epochs=1,
+                    performance=True, bf16=bf16, history_path=os.path.join(output_dir, "history.json"),
+                    checkpoint_path=os.path.join(output_dir, "best_model.pth"))
+    with open(os.path.join(output_dir, "history.json")) as f:
+        history = json.load(f)
+    results = {"train_steps_per_sec": history["train_samples_per_sec"][0] / batch_size}
+
+    precision = "bf16" if bf16 else "fp32"
+    evaluation = evaluate(prepare_model(model, precision), loader, device="cpu", precision=precision)
+    results["test_clips_per_sec"] = evaluation["clips_per_sec"]
+    for name, value in evaluation["latency_ms"].items():
+        if value is not None:
+            results[f"test_latency_{name}_ms"] = value
+    return results
+
+def flatten(results, prefix=""):
+    flat = {}
+    for name, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{name}."))
+        else:
+            flat[f"{prefix}{name}"] = value
+    return flat
+
+def compare(results, baseline, threshold):
+    """
+    Returns the regressions of `results` against `baseline`: timings (`*_ms`) that grew, and
+    throughputs (`*_per_sec`) that shrank, by more than `threshold` (a fraction).
+    """
+    regressions = []
+    current, previous = flatten(results), flatten(baseline)
+    print(f"{'metric':<55}{'baseline':>12}{'current':>12}{'slowdown':>10}")
+    for name, value in current.items():
+        old = previous.get(name)
+        if not old or value is None:
+            continue
+        if name.endswith("_ms"):
+            change = value / old - 1
+        elif name.endswith("_per_sec"):
+            change = old / value - 1
+        else:
+            continue
+        print(f"{name:<55}{old:>12.3f}{value:>12.3f}{100 * change:>+9.1f}%")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-files", type=int, default=32, help="number of synthetic clips")
+    parser.add_argument("--duration", type=float, default=1.0, help="clip length in seconds")
+    parser.add_argument("--sr", type=int, default=52734, help="native sampling rate of the synthetic clips")
+    parser.add_argument("--modes", nargs="+", default=list(FEATURE_EXTRACTORS))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes of the extraction engine")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--epochs", type=int, default=3, help="dataset epochs to time")
+    parser.add_argument("--bf16", action="store_true", help="train and evaluate under bf16 autocast")
+    parser.add_argument("--skip-model", action="store_true", help="skip the training and evaluation benchmarks")
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_folder = os.path.join(tmp, "wav")
+        wav_files = write_synthetic_dataset(wav_folder, n_files=args.n_files, duration=args.duration, sr=args.sr)
+
+        results["extraction"] = {}
+        print(f"{'mode':<16}{'decode':>10}{'resample':>10}{'transform':>11}{'save':>8}{'process_file':>14}  (ms/file)")
+        for mode in args.modes:
+            try:
+                stages = bench_stages(wav_files, mode, tmp)
+            except Exception as e:
+                print(f"{mode:<16}failed: {type(e).__name__}: {e}")
+                continue
+            results["extraction"][mode] = stages
+            print(f"{mode:<16}{stages['decode_ms']:>10.2f}{stages['resample_ms']:>10.2f}{stages['transform_ms']:>11.2f}"
+                  f"{stages['save_ms']:>8.2f}{stages['process_file_ms']:>14.2f}")
+
+        feature_folder = os.path.join(tmp, "mel")
+        results["engine"] = bench_engine(wav_folder, feature_folder, args.workers)
+        print(f"extract_dataset (melspectrogram): {results['engine']['files_per_sec']:.1f} files/sec")
+
+        results["dataset"], dataset = bench_dataset(feature_folder, args.batch_size, args.epochs)
+        for name, value in results["dataset"].items():
+            print(f"MelSpectrogramDataset {name}: {value:.1f}")
+
+        if not args.skip_model:
+            results["model"] = bench_model(dataset, args.batch_size, args.bf16, tmp)
+            for name, value in results["model"].items():
+                print(f"{name}: {value:.2f}")
+
+    report = {
+        "environment": {
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "numpy": np.__version__, "librosa": librosa.__version__, "torch": torch.__version__,
+        },
+        "config": vars(args),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"Regressions beyond {100 * args.threshold:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"No regressions beyond {100 * args.threshold:.0f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Wall time and per-worker utilization of `extract_dataset` on a dataset of many short clips and a
+few long recordings that are discovered last, with the files scheduled in discovery order
+(order=None) versus longest first (order="size").
+
+Run from the repository root:
+    python -m benchmarks.scheduler_benchmark --workers 4 --json scheduler.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from benchmarks.synthetic import write_synthetic_dataset
+from preprocessing.engine import extract_dataset
+
+def run(wav_dir, output_dir, order, args):
+    """Wall seconds and the summary report of one extraction run."""
+    reports = []
+    start = time.perf_counter()
+    extract_dataset(wav_dir, output_dir, modes=args.modes, max_workers=args.workers, order=order,
+                    incremental=False, report_every=float("inf"), hooks=[reports.append])
+    return time.perf_counter() - start, reports[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--short", type=int, default=120, help="number of 0.5-2 s clips")
+    parser.add_argument("--long", type=int, default=4, help="number of long recordings")
+    parser.add_argument("--long-duration", type=float, default=60.0)
+    parser.add_argument("--modes", nargs="+", default=["melspectrogram"])
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_dir = os.path.join(tmp, "wav")
+        write_synthetic_dataset(os.path.join(wav_dir, "a"), n_files=args.short, duration=(0.5, 2.0))
+        # Listed after the short clips, so discovery order submits them last.
+        write_synthetic_dataset(os.path.join(wav_dir, "z"), n_files=args.long, n_classes=1,
+                                duration=args.long_duration, seed=1)
+        print(f"{'order':<10}{'wall (s)':>10}{'files/s':>9}{'mean util':>11}{'min util':>10}")
+        for order in (None, "size"):
+            wall, report = run(wav_dir, os.path.join(tmp, f"out_{order}"), order, args)
+            utilization = [worker["utilization"] for worker in report.get("workers", {}).values()]
+            results[str(order)] = {"wall_s": wall, "files_per_sec": report["files_per_sec"],
+                                   "workers": report.get("workers", {})}
+            print(f"{str(order):<10}{wall:>10.2f}{report['files_per_sec']:>9.1f}"
+                  f"{sum(utilization) / max(len(utilization), 1):>10.0%}{min(utilization, default=0):>10.0%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version, "workers": args.workers, "short": args.short, "long": args.long,
+                       "long_duration": args.long_duration, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
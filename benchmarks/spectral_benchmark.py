@@ -0,0 +1,58 @@
+"""
+Per-clip cost of the mel, MFCC and STFT modes with the librosa extractors versus the shared-STFT
+NumPy backend (`features.spectral`), one mode at a time and all three together, with the largest
+absolute difference to the librosa output.
+
+Run from the repository root:
+    python -m benchmarks.spectral_benchmark --duration 5.0 --repeats 20 --json spectral.json
+"""
+import os
+import json
+import argparse
+import tempfile
+import numpy as np
+import soundfile as sf
+from benchmarks.kernel_benchmark import time_mode
+from benchmarks.synthetic import synthetic_clip
+from features.audio_cache import AudioCache
+from features.spectral import SPECTRAL_MODES, spectral_features
+from preprocessing.engine import FEATURE_EXTRACTORS
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=5.0, help="clip length in seconds")
+    parser.add_argument("--sr", type=int, default=52734, help="native sampling rate of the clip")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None, help="scipy.fft worker threads")
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clip.wav")
+        sf.write(path, synthetic_clip(args.duration, args.sr, np.random.default_rng(0)), args.sr)
+        # Decoding and resampling are served from the cache, so only the transforms are timed.
+        audio = AudioCache().open(path)
+        reference = {mode: FEATURE_EXTRACTORS[mode](audio) for mode in SPECTRAL_MODES}
+
+        cases = {mode: [mode] for mode in SPECTRAL_MODES}
+        cases["all"] = list(SPECTRAL_MODES)
+        results = {}
+        print(f"{'modes':<16}{'librosa (ms)':>14}{'numpy (ms)':>12}{'fast (ms)':>11}{'speedup':>9}{'max error':>11}")
+        for name, modes in cases.items():
+            librosa_s = time_mode(lambda a: [FEATURE_EXTRACTORS[mode](a) for mode in modes], audio, args.repeats, rebuild=False)
+            numpy_s = time_mode(lambda a: spectral_features(a, modes, workers=args.workers), audio, args.repeats, rebuild=False)
+            fast_s = time_mode(lambda a: spectral_features(a, modes, compat=False, workers=args.workers), audio,
+                               args.repeats, rebuild=False)
+            features = spectral_features(audio, modes)
+            error = max(float(np.max(np.abs(features[mode] - reference[mode]))) for mode in modes)
+            results[name] = {"librosa_ms": 1e3 * librosa_s, "numpy_ms": 1e3 * numpy_s, "fast_ms": 1e3 * fast_s,
+                             "speedup": librosa_s / numpy_s, "max_abs_error": error}
+            print(f"{name:<16}{1e3 * librosa_s:>14.2f}{1e3 * numpy_s:>12.2f}{1e3 * fast_s:>11.2f}"
+                  f"{librosa_s / numpy_s:>8.2f}x{error:>11.2g}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"duration": args.duration, "sr": args.sr, "workers": args.workers, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import copy
+import time
+import torch
+import torch.nn as nn
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+def prepare_model(model, precision="fp32", channels_last=False):
+    """
+    parameters:
+    model (torch.nn.Module): The trained model, e.g. `ResNetAudio`.
+    precision (str): "fp32", "bf16" or "int8". "bf16" keeps the weights and runs `evaluate` under
+        bfloat16 autocast. "int8" returns a dynamically quantized copy in which the `nn.Linear`
+        layers of the classifier head use int8 weights; PyTorch's dynamic quantization does not
+        cover convolutions, which stay in float32. int8 models only run on the CPU.
+    channels_last (bool): Convert the model to the channels_last memory format.
+
+    returns:
+    model (torch.nn.Module): The model in eval mode, ready for `evaluate`. The input model is not
+        modified for "int8".
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported precision: {precision}")
+    model.eval()
+    if precision == "int8":
+        model = torch.ao.quantization.quantize_dynamic(copy.deepcopy(model).cpu(), {nn.Linear}, dtype=torch.qint8)
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    return model
+
+def confusion_matrix(y_true, y_pred, num_classes):
+    """
+    parameters:
+    y_true (torch.Tensor): True labels, shape (N,).
+    y_pred (torch.Tensor): Predicted labels, shape (N,).
+    num_classes (int): Number of classes.
+
+    returns:
+    torch.Tensor: (num_classes, num_classes) counts, rows are true classes, columns predictions.
+    """
+    counts = torch.bincount(y_true.long() * num_classes + y_pred.long(), minlength=num_classes * num_classes)
+    return counts.view(num_classes, num_classes)
+
+def per_class_metrics(confusion):
+    """
+    parameters:
+    confusion (torch.Tensor): Confusion matrix from `confusion_matrix`.
+
+    returns:
+    metrics (dict): "precision", "recall", "f1" and "support" tensors with one value per class,
+    and "accuracy". Classes without predictions or samples get a precision or recall of 0.
+    """
+    confusion = confusion.double()
+    true_positives = confusion.diagonal()
+    support = confusion.sum(dim=1)
+    predicted = confusion.sum(dim=0)
+    precision = true_positives / predicted.clamp(min=1)
+    recall = true_positives / support.clamp(min=1)
+    f1 = 2 * precision * recall / (precision + recall).clamp(min=1e-12)
+    accuracy = true_positives.sum() / confusion.sum().clamp(min=1)
+    return {"precision": precision, "recall": recall, "f1": f1, "support": support.long(), "accuracy": accuracy.item()}
+
+def evaluate(model, loader, device=None, precision="fp32", channels_last=False, warmup_batches=1):
+    """
+    parameters:
+    model (torch.nn.Module): The model to evaluate, as returned by `prepare_model`.
+    loader (torch.utils.data.DataLoader): Loader yielding (inputs, labels) batches, or
+        (inputs, labels, lengths) from `processing.PadCollate`.
+    device (torch.device, optional): Device to run on. Defaults to the device of the model's parameters.
+    precision (str): "bf16" runs the forward pass under bfloat16 autocast; "fp32" and "int8"
+        run it as is (see `prepare_model`).
+    channels_last (bool): Convert each 4-D input batch to the channels_last memory format.
+    warmup_batches (int): Number of first batches left out of the latency statistics.
+
+    returns:
+    results (dict):
+        - "y_true", "y_pred": (N,) label tensors.
+        - "probs": (N, n_classes) softmax probabilities.
+        - "confusion": (n_classes, n_classes) confusion matrix.
+        - "precision", "recall", "f1", "support", "accuracy": as in `per_class_metrics`.
+        - "latency_ms": p50, p90, p99 and mean latency of one batch, in milliseconds.
+        - "clips_per_sec": Clips processed per second over the whole run.
+
+    This function runs under `torch.inference_mode` and keeps the labels, predictions and
+    probabilities of every batch on the device, concatenated once after the last batch, so the
+    results cover exactly the samples the loader yielded (with any sampler or `drop_last`).
+    The confusion matrix and the metrics are computed on those tensors; results are moved to
+    the CPU once at the end. A batch's latency covers its transfer to the device and the forward
+    pass, synchronised on CUDA.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported precision: {precision}")
+    if device is None:
+        device = next(model.parameters(), torch.empty(0)).device
+    device = torch.device(device)
+    if precision == "int8" and device.type != "cpu":
+        raise ValueError("int8 dynamically quantized models only run on the CPU")
+    model.eval()
+
+    y_true, y_pred, probs = [], [], []
+    latencies = []
+    start = time.perf_counter()
+    with torch.inference_mode(), torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=precision == "bf16"):
+        for x_batch, y_batch, *_ in loader:
+            batch_start = time.perf_counter()
+            x_batch = x_batch.to(device, non_blocking=True)
+            if channels_last and x_batch.dim() == 4:
+                x_batch = x_batch.contiguous(memory_format=torch.channels_last)
+            logits = model(x_batch)
+            if device.type == "cuda":
+                torch.cuda.synchronize(device)
+            latencies.append(time.perf_counter() - batch_start)
+
+            probs.append(torch.softmax(logits.float(), dim=1))
+            y_pred.append(torch.argmax(logits, dim=1))
+            y_true.append(y_batch.to(device, non_blocking=True))
+    elapsed = time.perf_counter() - start
+
+    if probs:
+        y_true, y_pred, probs = torch.cat(y_true), torch.cat(y_pred), torch.cat(probs)
+    else:
+        y_true = y_pred = torch.empty(0, dtype=torch.long, device=device)
+        probs = torch.empty((0, 0), device=device)
+    n_classes = probs.shape[1]
+    confusion = confusion_matrix(y_true, y_pred, n_classes)
+    metrics = per_class_metrics(confusion)
+
+    timed = torch.tensor(latencies[warmup_batches:] or latencies, dtype=torch.float64) * 1000
+    if len(timed):
+        quantiles = torch.quantile(timed, torch.tensor([0.5, 0.9, 0.99], dtype=torch.float64)).tolist()
+        latency = {"p50": quantiles[0], "p90": quantiles[1], "p99": quantiles[2], "mean": timed.mean().item()}
+    else:
+        latency = {"p50": None, "p90": None, "p99": None, "mean": None}
+
+    results = {
+        "y_true": y_true.cpu(),
+        "y_pred": y_pred.cpu(),
+        "probs": probs.cpu(),
+        "confusion": confusion.cpu(),
+        "latency_ms": latency,
+        "clips_per_sec": len(y_true) / elapsed if elapsed > 0 else None,
+    }
+    results.update({name: value.cpu() if torch.is_tensor(value) else value for name, value in metrics.items()})
+    return results
+
+def print_report(results, idx2class=None):
+    """Prints the per-class metrics, accuracy, latency percentiles and throughput of `evaluate`."""
+    n_classes = len(results["support"])
+    names = [idx2class[i] if idx2class is not None else str(i) for i in range(n_classes)]
+    width = max([len(name) for name in names] + [5])
+    print(f"{'class':>{width}}  precision  recall  f1      support")
+    for i, name in enumerate(names):
+        print(f"{name:>{width}}  {results['precision'][i]:.4f}     {results['recall'][i]:.4f}  "
+              f"{results['f1'][i]:.4f}  {int(results['support'][i])}")
+    print(f"Accuracy: {results['accuracy']:.4f}")
+    latency = results["latency_ms"]
+    if latency["p50"] is not None:
+        print(f"Batch latency: p50 {latency['p50']:.2f} ms, p90 {latency['p90']:.2f} ms, p99 {latency['p99']:.2f} ms")
+    if results["clips_per_sec"] is not None:
+        print(f"Throughput: {results['clips_per_sec']:.1f} clips/sec")
@@ -1,4 +1,4 @@
-import torch
+from evaluation.engine import evaluate
 
 def test_model(device, model, test_loader, idx2class=None):
     """
@@ -11,23 +11,15 @@ def test_model(device, model, test_loader, idx2class=None):
     returns:
     y_true_list (list): List of true labels for the test dataset.
     y_pred_list (list): List of predicted labels for the test dataset.
-    y_pred_prob (list): List of predicted probabilities for the test dataset.
+    y_pred_prob (np.ndarray): (n_samples, n_classes) softmax probabilities for the test dataset.
     
     This function evaluates the model on the test dataset and returns the true labels, predicted labels,
-    and predicted probabilities. It does not compute any metrics but simply collects the predictions.
+    and predicted probabilities of every sample. It does not compute any metrics but simply collects the
+    predictions; `evaluation.engine.evaluate` also returns the confusion matrix, per-class metrics and timings.
     """
-    y_pred_list = []
-    y_true_list = []
-    y_pred_prob=[]
-    with torch.no_grad():
-        for x_batch, y_batch in test_loader:
-            x_batch, y_batch = x_batch.to(device), y_batch.to(device)
-            y_test_pred = model(x_batch)
-            _, y_pred_tag = torch.max(y_test_pred, dim = 1)
-            y_pred_list.append(y_pred_tag.cpu().numpy())
-            y_true_list.append(y_batch.cpu().numpy())
-            y_pred_prob.append(y_test_pred.cpu().numpy())
-    y_pred_list = [i[0] for i in y_pred_list]
-    y_true_list = [i[0] for i in y_true_list]
+    results = evaluate(model, test_loader, device=device)
+    y_true_list = results["y_true"].tolist()
+    y_pred_list = results["y_pred"].tolist()
+    y_pred_prob = results["probs"].numpy()
 
-    return y_true_list, y_pred_list,y_pred_prob
\ No newline at end of file
+    return y_true_list, y_pred_list,y_pred_prob
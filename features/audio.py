@@ -0,0 +1,36 @@
+import os
+import librosa
+from features.audio_cache import DecodedAudio
+from features.instrumentation import METRICS
+
+def load_audio(source, sr=22050):
+    """
+    parameters:
+    source (str, tuple or DecodedAudio): Path to the input audio file, an already decoded (y, sr) pair,
+        or a `DecodedAudio` handle from `features.audio_cache.AudioCache`.
+    sr (float or None): Target sampling rate. None keeps the native sampling rate.
+
+    returns:
+    y (np.ndarray): Mono audio time series at the requested sampling rate.
+    sr (float): Sampling rate of `y`.
+
+    This function is the single entry point the feature extractors use to obtain audio.
+    A path is decoded with `librosa.load` exactly as before. A (y, sr) pair, as produced by
+    `librosa.load(path, sr=None)`, is only resampled, so several extractors can share one decode
+    of the same file. `librosa.load` itself decodes at the native rate and then resamples,
+    so both routes give the same samples. A `DecodedAudio` handle is served from its cache, which
+    decodes the file once and resamples it at most once per target rate.
+    Decoding and resampling are timed as the "load" and "resample" stages of `features.instrumentation`.
+    """
+    if isinstance(source, DecodedAudio):
+        return source.load(sr)
+    if isinstance(source, tuple):
+        y, native_sr = source
+        if sr is None or sr == native_sr:
+            return y, native_sr
+        with METRICS.stage("resample"):
+            return librosa.resample(y, orig_sr=native_sr, target_sr=sr), sr
+    with METRICS.stage("load"):
+        y, native_sr = librosa.load(source, sr=None)
+    METRICS.count("bytes_read", os.path.getsize(source))
+    return load_audio((y, native_sr), sr=sr)
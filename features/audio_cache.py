@@ -0,0 +1,145 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import librosa
+from features.instrumentation import METRICS
+
+class AudioCache:
+    """
+    Decoded-audio cache shared by the feature extractors.
+
+    Entries are keyed on (path, mtime, sr), so a file that changes on disk is decoded again.
+    `sr=None` is the native-rate decode; every other rate is produced by resampling the native
+    decode once and is then served from the cache, so computing several features of one file
+    costs one decode and one resample per distinct target rate.
+    The in-memory part is an LRU bounded by `max_bytes`; signals larger than that are not kept.
+    A `DecodedAudio` handle (see `open`) additionally pins every array of its file for as long as
+    it is alive, so a recording over the budget is still decoded once and resampled once per rate
+    while one handle is used for all its features. If `cache_dir` is given, decoded and
+    resampled signals are also stored there as float32 `.npz` files and reused across runs
+    and processes.
+    """
+    def __init__(self, max_bytes=256 * 1024 ** 2, cache_dir=None, res_type="soxr_hq"):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.res_type = res_type
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def open(self, path):
+        """Returns a `DecodedAudio` handle for `path` that the extractors accept instead of the path."""
+        return DecodedAudio(path, self)
+
+    def get(self, path, sr=None, pinned=None):
+        """
+        parameters:
+        path (str): Path to the input audio file.
+        sr (float or None): Target sampling rate. None keeps the native sampling rate.
+        pinned (dict, optional): sr -> (y, sr) arrays of this file held by the caller. It is
+            looked up first and receives every array this call obtains, the native decode
+            included, whatever the size of the LRU.
+
+        returns:
+        y (np.ndarray): Mono float32 audio at the requested rate. The array is shared, do not modify it in place.
+        sr (float): Sampling rate of `y`.
+        """
+        if pinned is not None and sr in pinned:
+            self.hits += 1
+            return pinned[sr]
+        path = os.path.abspath(path)
+        key = (path, os.stat(path).st_mtime_ns, sr)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if pinned is not None:
+                    pinned[sr] = entry
+                return entry
+            self.misses += 1
+
+        entry = self._load_from_disk(key)
+        if entry is None:
+            if sr is None:
+                with METRICS.stage("load"):
+                    y, native_sr = librosa.load(path, sr=None)
+                METRICS.count("bytes_read", os.path.getsize(path))
+                entry = (y.astype(np.float32, copy=False), native_sr)
+            else:
+                y, native_sr = self.get(path, None, pinned)
+                if sr == native_sr:
+                    entry = (y, native_sr)
+                else:
+                    with METRICS.stage("resample"):
+                        entry = (librosa.resample(y, orig_sr=native_sr, target_sr=sr, res_type=self.res_type), sr)
+            self._save_to_disk(key, entry)
+        self._store(key, entry)
+        if pinned is not None:
+            pinned[sr] = entry
+        return entry
+
+    def clear(self):
+        """Drops every in-memory entry. The on-disk cache is left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _store(self, key, entry):
+        nbytes = entry[0].nbytes
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = entry
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (old_y, _) = self._entries.popitem(last=False)
+                self.current_bytes -= old_y.nbytes
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".npz")
+
+    def _load_from_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        disk_path = self._disk_path(key)
+        if not os.path.exists(disk_path):
+            return None
+        with np.load(disk_path) as data:
+            return data["y"], data["sr"].item()
+
+    def _save_to_disk(self, key, entry):
+        if self.cache_dir is None:
+            return
+        disk_path = self._disk_path(key)
+        # Write under a private name first so concurrent workers never read a partial file.
+        tmp_path = f"{disk_path[:-4]}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, y=entry[0].astype(np.float32, copy=False), sr=entry[1])
+        os.replace(tmp_path, disk_path)
+
+class DecodedAudio:
+    """
+    Handle on one audio file backed by an `AudioCache`; pass it to a feature extractor instead of the path.
+    The handle keeps every array it has loaded (native and resampled) until it is dropped or
+    `release` is called, independently of the cache's memory budget.
+    """
+    def __init__(self, path, cache=None):
+        self.path = path
+        self.cache = cache if cache is not None else AudioCache()
+        self.arrays = {}
+
+    def load(self, sr=22050):
+        return self.cache.get(self.path, sr, self.arrays)
+
+    def release(self):
+        """Unpins the arrays; they stay available from the cache if they fit its budget."""
+        self.arrays = {}
@@ -2,11 +2,23 @@ import sys
 import os
 import numpy as np
 import librosa
+from features.audio import load_audio
+from features.instrumentation import METRICS
+from features.kernels import cqt
+
+CQT_SR = 1.46*22050
+CQT_PARAMS = dict(
+    hop_length=256,      # Number of samples between successive frames
+    fmin=18,             # Minimum frequency (C1 in musical scale)
+    n_bins=95,           # Total number of frequency bins
+    bins_per_octave=12,  # Number of bins per octave
+    window="hann",       # Type of window
+)
 
 def cqt_features(file_path):
     """
     parameters:
-    file_path (str): Path to the input audio file.
+    file_path (str, tuple or DecodedAudio): Path to the input audio file, a decoded (y, sr) pair or a `DecodedAudio` handle.
 
     returns:
     cqt_db (np.ndarray): The Constant-Q Transform (CQT) of the audio file, converted to decibels (dB).
@@ -17,17 +29,11 @@ def cqt_features(file_path):
     which is approximately 32258 Hz, to capture a wide range of frequencies.
     The CQT is computed with a hop length of 256 samples, a minimum frequency of 18 Hz (C1 in the musical scale),
     and a total of 95 frequency bins, with 12 bins per octave.
-    The Hann window is used for the CQT computation"""
-    y, sr = librosa.load(file_path, sr=1.46*22050)
-    cqt = librosa.cqt(
-    y,
-    sr=sr,
-    hop_length=256,      # Number of samples between successive frames
-    fmin=18,           # Minimum frequency (C1 in musical scale)           # Maximum frequency
-    n_bins=95,           # Total number of frequency bins
-    bins_per_octave=12,  # Number of bins per octave
-    window="hann"        # Type of window
-)
+    The Hann window is used for the CQT computation.
+    The CQT filter bases are built once per process and reused, see `features.kernels.cqt`."""
+    y, sr = load_audio(file_path, sr=CQT_SR)
+    cqt_spec = cqt(y, sr=sr, **CQT_PARAMS)
 
-    cqt_db = librosa.amplitude_to_db(np.abs(cqt), ref=np.max)
+    with METRICS.stage("db"):
+        cqt_db = librosa.amplitude_to_db(np.abs(cqt_spec), ref=np.max)
     return cqt_db
\ No newline at end of file
@@ -1,13 +1,27 @@
 import sys
 import os
-import numpy as np
-import librosa
-from nnAudio2 import Spectrogram
+from features.audio import load_audio
+from features.kernels import get_kernel
+
+GAMMATONE_PARAMS = dict(
+    n_fft=1024,
+    n_bins=95,
+    hop_length=256,
+    window='hann',
+    center=True,
+    pad_mode='reflect',
+    htk=False,
+    fmin=18,
+    fmax=None,  # None means Nyquist frequency
+    norm=1,
+    trainable_bins=False,
+    trainable_STFT=False,
+)
 
 def gammatonegram(input_file_path):
     """
     parameters:
-    input_file_path (str): Path to the input audio file.
+    input_file_path (str, tuple or DecodedAudio): Path to the input audio file, a decoded (y, sr) pair or a `DecodedAudio` handle.
 
     returns:
     np.ndarray: Gammatonegram representation of the audio.
@@ -21,36 +35,20 @@ def gammatonegram(input_file_path):
     The Gammatonegram is computed with a minimum frequency of 18 Hz and a maximum
     frequency set to None, which means it will use the Nyquist frequency.
     The output is normalized and converted to a NumPy array for consistency.
+    The Gammatonegram layer is built once per sampling rate and reused, see `features.kernels`.
     The function is designed to run on CPU, ensuring compatibility with systems
     that do not have CUDA support.
-    If an error occurs during processing, it will print an error message and return None.
+    Errors (e.g. a clip shorter than the reflect padding) are raised to the caller.
     """
-    try:
-        # Load the audio file
-        y, sr = librosa.load(input_file_path, sr=None)
-
-        # Create a Gammatonegram instance
-        gammatonegram = Spectrogram.Gammatonegram(
-            sr=sr,
-            n_fft=1024,
-            n_bins=95,
-            hop_length=256,
-            window='hann',
-            center=True,
-            pad_mode='reflect',
-            htk=False,
-            fmin=18,
-            fmax=None,  # None means Nyquist frequency
-            norm=1,
-            trainable_bins=False,
-            trainable_STFT=False,
-            device='cpu'  # Force CPU usage instead of CUDA
-        )
-
-        # Compute the Gammatonegram
-        spec = gammatonegram(y)
-
-        return spec.numpy()  # Convert to numpy array for consistency
-    except Exception as e:
-        print(f"Error processing {input_file_path}: {e}")
-        return None
\ No newline at end of file
+    import torch  # imported on first use, so the other modes do not pay for it
+
+    # Load the audio file
+    y, sr = load_audio(input_file_path, sr=None)
+
+    # Get the Gammatonegram layer for this sampling rate (built once per process)
+    gammatonegram = get_kernel("gammatone", sr=sr, **GAMMATONE_PARAMS)
+
+    # Compute the Gammatonegram
+    spec = gammatonegram(torch.from_numpy(y))
+
+    return spec.numpy()  # Convert to numpy array for consistency
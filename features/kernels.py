@@ -0,0 +1,183 @@
+import threading
+import numpy as np
+import librosa
+
+# Transforms built once per process, keyed on (kind, parameters).
+_KERNELS = {}
+_KERNELS_LOCK = threading.Lock()
+
+def _build_mel(sr, n_fft, n_mels, fmin, fmax):
+    return librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels, fmin=fmin, fmax=fmax)
+
+def _build_window(window, n_fft):
+    return librosa.filters.get_window(window, n_fft, fftbins=True).astype(np.float32)
+
+def _build_gammatone(**params):
+    from nnAudio2 import Spectrogram
+    return Spectrogram.Gammatonegram(**params)
+
+def _build_scattering1d(J, T, Q):
+    from kymatio.torch import Scattering1D
+    return Scattering1D(J=J, shape=(T,), Q=Q)
+
+def _two_factors(n):
+    # How many times n can be halved exactly.
+    count = 0
+    while n > 0 and n % 2 == 0:
+        n //= 2
+        count += 1
+    return count
+
+def _build_cqt(sr, hop_length, fmin, n_bins, bins_per_octave, window, filter_scale, norm, sparsity, dtype):
+    # The filter bases of `librosa.cqt` (tuning=0, scale=True), built with the public
+    # `librosa.filters` API in the same order and precision, so the output is unchanged.
+    n_octaves = int(np.ceil(n_bins / bins_per_octave))
+    n_filters = min(bins_per_octave, n_bins)
+    freqs = librosa.interval_frequencies(n_bins=n_bins, fmin=fmin, intervals="equal",
+                                         bins_per_octave=bins_per_octave, sort=True)
+    # Relative bandwidth from the local octave resolution, as librosa derives it.
+    logf = np.log2(freqs)
+    bpo = np.empty_like(freqs)
+    bpo[0] = 1 / (logf[1] - logf[0])
+    bpo[-1] = 1 / (logf[-1] - logf[-2])
+    bpo[1:-1] = 2 / (logf[2:] - logf[:-2])
+    alpha = (2.0 ** (2 / bpo) - 1) / (2.0 ** (2 / bpo) + 1)
+    _, filter_cutoff = librosa.filters.wavelet_lengths(freqs=freqs, sr=sr, window=window, filter_scale=filter_scale,
+                                                       gamma=0, alpha=alpha)
+    nyquist = sr / 2.0
+    if filter_cutoff > nyquist:
+        raise ValueError(f"CQT filters up to {filter_cutoff:.1f} Hz exceed the Nyquist frequency {nyquist:.1f} Hz")
+
+    # Early downsampling: the whole signal is decimated while the top octave still fits.
+    downsample_count = min(max(0, int(np.ceil(np.log2(nyquist / filter_cutoff)) - 1) - 1),
+                           max(0, _two_factors(hop_length) - n_octaves + 1))
+    factor = 2 ** downsample_count
+    base_sr = sr / factor
+    octave_sr, octave_hop = base_sr, hop_length // factor
+
+    octaves = []
+    for i in range(n_octaves):
+        bins = slice(-n_filters, None) if i == 0 else slice(-n_filters * (i + 1), -n_filters * i)
+        basis, lengths = librosa.filters.wavelet(freqs=freqs[bins], sr=octave_sr, filter_scale=filter_scale, norm=norm,
+                                                 pad_fft=True, window=window, gamma=0, alpha=alpha[bins])
+        n_fft = basis.shape[1]
+        basis *= lengths[:, np.newaxis] / float(n_fft)
+        fft_basis = librosa.get_fftlib().fft(basis, n=n_fft, axis=1)[:, :n_fft // 2 + 1]
+        fft_basis = librosa.util.sparsify_rows(fft_basis, quantile=sparsity, dtype=dtype)
+        fft_basis[:] *= np.sqrt(base_sr / octave_sr)
+        halve = octave_hop % 2 == 0
+        octaves.append((fft_basis, n_fft, octave_hop, halve))
+        if halve:
+            octave_hop //= 2
+            octave_sr /= 2.0
+
+    lengths, _ = librosa.filters.wavelet_lengths(freqs=freqs, sr=base_sr, window=window, filter_scale=filter_scale,
+                                                 gamma=0, alpha=alpha)
+    return {"factor": factor, "octaves": octaves, "scale": np.sqrt(lengths)[:, np.newaxis]}
+
+_BUILDERS = {
+    "mel": _build_mel,
+    "window": _build_window,
+    "gammatone": _build_gammatone,
+    "scattering1d": _build_scattering1d,
+    "cqt": _build_cqt,
+}
+
+def get_kernel(kind, **params):
+    """
+    parameters:
+    kind (str): Kind of transform, one of "mel", "window", "gammatone", "scattering1d" or "cqt".
+    **params: Parameters of the transform, e.g. sr, n_fft, n_mels, fmin, fmax for "mel",
+        window, n_fft for "window" or J, T, Q for "scattering1d" (see `cqt` for "cqt").
+
+    returns:
+    The mel filterbank (np.ndarray), float32 STFT window (np.ndarray), nnAudio2 Gammatonegram layer, kymatio Scattering1D
+    transform or per-octave CQT filter bases for this parameter set.
+
+    Each distinct parameter set is built once per process and reused by every later call.
+    The returned object is shared, so callers must not modify it.
+    """
+    key = (kind, tuple(sorted(params.items())))
+    kernel = _KERNELS.get(key)
+    if kernel is None:
+        with _KERNELS_LOCK:
+            kernel = _KERNELS.get(key)
+            if kernel is None:
+                kernel = _BUILDERS[kind](**params)
+                _KERNELS[key] = kernel
+    return kernel
+
+def clear_kernels():
+    """Drops every cached transform."""
+    with _KERNELS_LOCK:
+        _KERNELS.clear()
+
+def cqt(y, sr=22050, hop_length=512, fmin=None, n_bins=84, bins_per_octave=12, window="hann", filter_scale=1,
+        norm=1, sparsity=0.01, res_type="soxr_hq"):
+    """
+    parameters:
+    y (np.ndarray): Audio time series, or a (B, T) batch of them.
+    sr, hop_length, fmin, n_bins, bins_per_octave, window, filter_scale, norm, sparsity, res_type:
+        CQT parameters, as in `librosa.cqt` (with tuning=0.0).
+
+    returns:
+    np.ndarray: Complex CQT, identical to `librosa.cqt(y, tuning=0.0, ...)`.
+
+    Same computation as librosa, but the per-octave filter bases and their FFTs come from the
+    kernel registry instead of being rebuilt for every clip.
+    """
+    y = np.asarray(y)
+    if fmin is None:
+        fmin = librosa.note_to_hz("C1")
+    dtype = librosa.util.dtype_r2c(y.dtype)
+    plan = get_kernel("cqt", sr=sr, hop_length=hop_length, fmin=fmin, n_bins=n_bins, bins_per_octave=bins_per_octave,
+                      window=window, filter_scale=filter_scale, norm=norm, sparsity=sparsity, dtype=np.dtype(dtype).str)
+    factor = plan["factor"]
+    if factor > 1:
+        if y.shape[-1] < factor:
+            raise ValueError(f"Input signal of {y.shape[-1]} samples is too short for this CQT")
+        y = librosa.resample(y, orig_sr=factor, target_sr=1, res_type=res_type, scale=True)
+
+    responses = []
+    for fft_basis, n_fft, octave_hop, halve in plan["octaves"]:
+        D = librosa.stft(y, n_fft=n_fft, hop_length=octave_hop, window="ones", pad_mode="constant", dtype=dtype)
+        frames = D.reshape((-1,) + D.shape[-2:])
+        response = np.empty((frames.shape[0], fft_basis.shape[0], frames.shape[-1]), dtype=D.dtype)
+        for i in range(frames.shape[0]):
+            response[i] = fft_basis.dot(frames[i])
+        responses.append(response.reshape(D.shape[:-2] + response.shape[-2:]))
+        if halve:
+            y = librosa.resample(y, orig_sr=2, target_sr=1, res_type=res_type, scale=True)
+
+    # Stack the octaves, lowest bins last in the list, trimmed to the shortest response.
+    n_frames = min(response.shape[-1] for response in responses)
+    C = np.empty(responses[0].shape[:-2] + (n_bins, n_frames), dtype=dtype, order="F")
+    end = n_bins
+    for response in responses:
+        n_octave = response.shape[-2]
+        if end < n_octave:
+            C[..., :end, :] = response[..., -end:, :n_frames]
+        else:
+            C[..., end - n_octave:end, :] = response[..., :n_frames]
+        end -= n_octave
+    C /= plan["scale"]
+    return C
+
+def mel_power(y, sr, n_fft, hop_length, n_mels, fmin, fmax, window='hann', center=True, pad_mode='constant'):
+    """
+    parameters:
+    y (np.ndarray): Audio time series.
+    sr (float): Sampling rate of `y`.
+    n_fft, hop_length, window, center, pad_mode: STFT parameters, as in `librosa.stft`.
+    n_mels, fmin, fmax: Mel filterbank parameters, as in `librosa.filters.mel`.
+
+    returns:
+    np.ndarray: Mel power spectrogram, identical to `librosa.feature.melspectrogram(power=2.0)`.
+
+    Same computation as librosa, but the mel filterbank comes from the kernel registry
+    instead of being rebuilt for every clip.
+    """
+    S = np.abs(librosa.stft(y, n_fft=n_fft, hop_length=hop_length, window=window, center=center,
+                            pad_mode=pad_mode)) ** 2
+    mel_basis = get_kernel("mel", sr=sr, n_fft=n_fft, n_mels=n_mels, fmin=fmin, fmax=fmax)
+    return np.einsum("...ft,mf->...mt", S, mel_basis, optimize=True)
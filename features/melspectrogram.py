@@ -2,11 +2,26 @@ import sys
 import os
 import numpy as np
 import librosa
+from features.audio import load_audio
+from features.instrumentation import METRICS
+from features.kernels import mel_power
+
+MEL_SR = 1.46*22050
+MEL_PARAMS = dict(
+    n_fft=1024,
+    hop_length=256,
+    window='hann',
+    center=True,
+    pad_mode='constant',
+    n_mels=95,
+    fmin=18,     # C1
+    fmax=4186,   # C7
+)
 
 def melspectrogram(file_path):
     """
     parameters:
-    file_path (str): Path to the input audio file.
+    file_path (str, tuple or DecodedAudio): Path to the input audio file, a decoded (y, sr) pair or a `DecodedAudio` handle.
 
     returns:
     np.ndarray: Mel spectrogram representation of the audio file.
@@ -21,22 +36,13 @@ def melspectrogram(file_path):
     and 95 Mel frequency bins. The minimum frequency is set to 18 Hz (C1 in the musical scale),
     and the maximum frequency is set to 4186 Hz (C7 in the musical scale).
     The output is normalized to decibels (dB) using the maximum value as the reference.
+    The mel filterbank is built once per process and reused, see `features.kernels`.
     This function is designed to run on CPU, ensuring compatibility with systems
     that do not have CUDA support. If an error occurs during processing,
     it will print an error message and return None.
     """
-    audio,_ = librosa.load(file_path,sr=1.46*22050)
-    features=librosa.feature.melspectrogram(
-        y=audio,
-        sr=1.46*22050,
-        n_fft=1024,
-        hop_length=256,
-        window='hann',
-        center=True,
-        pad_mode='constant',
-        power=2.0,
-        n_mels=95,
-        fmin=18,
-        fmax=4186)
-    mel_spec_db = librosa.power_to_db(features, ref=np.max)
+    audio,_ = load_audio(file_path,sr=MEL_SR)
+    features=mel_power(audio, sr=MEL_SR, **MEL_PARAMS)
+    with METRICS.stage("db"):
+        mel_spec_db = librosa.power_to_db(features, ref=np.max)
     return mel_spec_db
\ No newline at end of file
@@ -2,11 +2,20 @@ import sys
 import os
 import numpy as np
 import librosa
+from features.audio import load_audio
 
-def extract_mfcc_1d(file_path, n_mfcc=45):
+MFCC_SR = 22050
+MFCC_PARAMS = dict(
+    n_fft=2048,
+    hop_length=512,
+    n_mels=50,
+)
+N_MFCC = 45  # Default number of MFCC coefficients
+
+def extract_mfcc_1d(file_path, n_mfcc=N_MFCC):
     """
     parameters:
-    file_path (str): Path to the input audio file.
+    file_path (str, tuple or DecodedAudio): Path to the input audio file, a decoded (y, sr) pair or a `DecodedAudio` handle.
 
     returns:
     np.ndarray: 1D array of MFCC features extracted from the audio file.
@@ -20,14 +29,7 @@ def extract_mfcc_1d(file_path, n_mfcc=45):
     The function is designed to run on CPU, ensuring compatibility with systems that do not have CUDA support.
     If an error occurs during processing, it will print an error message and return None.
     """
-    audio, sr = librosa.load(file_path, sr=22050)
-    mfcc = librosa.feature.mfcc(
-        y=audio,
-        sr=sr,
-        n_fft=2048,
-        hop_length=512,
-        n_mels=50,
-        n_mfcc=n_mfcc
-    )
+    audio, sr = load_audio(file_path, sr=MFCC_SR)
+    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=n_mfcc, **MFCC_PARAMS)
     mfcc_1d = mfcc.flatten()
     return mfcc_1d
\ No newline at end of file
@@ -0,0 +1,135 @@
+import threading
+import numpy as np
+import librosa
+import scipy.fft
+from features.audio import load_audio
+from features.instrumentation import METRICS
+from features.kernels import get_kernel
+from features.melspectrogram import MEL_PARAMS, MEL_SR
+from features.mfcc_features import MFCC_PARAMS, MFCC_SR, N_MFCC
+from features.stft_features import STFT_PARAMS, STFT_SR
+
+# Modes this backend computes from a shared power spectrogram.
+SPECTRAL_MODES = ("melspectrogram", "mfcc", "stft")
+
+# mode -> STFT configuration (sr, n_fft, hop_length). `stft_features` uses n_fft=2024, which
+# factors as 2^3 * 11 * 23 and is slower to transform than 2048; the fast configuration takes the
+# "mfcc" STFT size (2048 at the same rate and hop) instead, so "stft" shares that spectrogram.
+STFT_CONFIGS = {
+    "melspectrogram": (MEL_SR, MEL_PARAMS["n_fft"], MEL_PARAMS["hop_length"]),
+    "mfcc": (MFCC_SR, MFCC_PARAMS["n_fft"], MFCC_PARAMS["hop_length"]),
+    "stft": (STFT_SR, STFT_PARAMS["n_fft"], STFT_PARAMS["hop_length"]),
+}
+FAST_STFT_CONFIGS = dict(STFT_CONFIGS, stft=STFT_CONFIGS["mfcc"])
+
+# Frames transformed per scipy.fft call: bounds the scratch memory to a few MB per thread.
+BLOCK_FRAMES = 256
+
+# Scratch buffers of each thread, grown on demand and reused across clips.
+_workspace = threading.local()
+
+def _scratch(name, size, dtype=np.float32):
+    buffers = _workspace.__dict__.setdefault("buffers", {})
+    buffer = buffers.get(name)
+    if buffer is None or buffer.size < size or buffer.dtype != dtype:
+        buffer = np.empty(size, dtype=dtype)
+        buffers[name] = buffer
+    return buffer[:size]
+
+def power_spectrogram(y, n_fft, hop_length, workers=None, out=None):
+    """
+    parameters:
+    y (np.ndarray): Mono audio time series.
+    n_fft (int): FFT size, also the length of the Hann window.
+    hop_length (int): Number of samples between successive frames.
+    workers (int, optional): Threads scipy.fft may use for each block of frames.
+    out (np.ndarray, optional): Preallocated float32 array of shape (1 + n_fft // 2, 1 + len(y) // hop_length).
+
+    returns:
+    np.ndarray: Power spectrogram, the same as `np.abs(librosa.stft(y, n_fft, hop_length, pad_mode='constant')) ** 2`
+    up to float32 rounding.
+
+    The padded signal and the windowed frames live in per-thread scratch buffers, and the frames
+    are transformed in blocks of `BLOCK_FRAMES` with `scipy.fft.rfft`, so the only allocation that
+    grows with the clip is the output.
+    """
+    y = np.asarray(y, dtype=np.float32)
+    n_bins = 1 + n_fft // 2
+    n_frames = 1 + len(y) // hop_length
+    if out is None:
+        out = np.empty((n_bins, n_frames), dtype=np.float32)
+    elif out.shape != (n_bins, n_frames):
+        raise ValueError(f"out has shape {out.shape}, expected {(n_bins, n_frames)}")
+
+    # Centred frames with zero padding, as librosa.stft(center=True, pad_mode='constant').
+    pad = n_fft // 2
+    padded = _scratch("padded", len(y) + 2 * pad)
+    padded[:pad] = 0
+    padded[pad:pad + len(y)] = y
+    padded[pad + len(y):] = 0
+    if len(padded) < n_fft:
+        raise ValueError(f"Clip of {len(y)} samples is too short for n_fft={n_fft}")
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length][:n_frames]
+    window = get_kernel("window", window="hann", n_fft=n_fft)
+
+    block = _scratch("block", BLOCK_FRAMES * n_fft).reshape(BLOCK_FRAMES, n_fft)
+    power = _scratch("power", BLOCK_FRAMES * n_bins).reshape(BLOCK_FRAMES, n_bins)
+    imag = _scratch("imag", BLOCK_FRAMES * n_bins).reshape(BLOCK_FRAMES, n_bins)
+    for start in range(0, n_frames, BLOCK_FRAMES):
+        n = min(BLOCK_FRAMES, n_frames - start)
+        np.multiply(frames[start:start + n], window, out=block[:n])
+        spectrum = scipy.fft.rfft(block[:n], axis=-1, workers=workers, overwrite_x=True)
+        # Squared in the frame-major layout of the FFT output, then transposed in a single copy.
+        np.square(spectrum.real, out=power[:n])
+        np.square(spectrum.imag, out=imag[:n])
+        power[:n] += imag[:n]
+        out[:, start:start + n] = power[:n].T
+    return out
+
+def spectral_features(source, modes=SPECTRAL_MODES, compat=True, workers=None, n_mfcc=N_MFCC):
+    """
+    parameters:
+    source (str, tuple or DecodedAudio): Path to the input audio file, a decoded (y, sr) pair or a `DecodedAudio` handle.
+    modes (list): Modes to compute, a subset of `SPECTRAL_MODES`.
+    compat (bool): Use the STFT sizes of the librosa extractors (`STFT_CONFIGS`), so existing
+        outputs keep their shape. False uses FFT-friendly sizes (`FAST_STFT_CONFIGS`).
+    workers (int, optional): Threads scipy.fft may use, see `power_spectrogram`.
+    n_mfcc (int): Number of MFCC coefficients, as in `extract_mfcc_1d`.
+
+    returns:
+    dict: Mapping from mode to the feature array, with the same layout as `melspectrogram`,
+    `extract_mfcc_1d` and `stft_features`.
+
+    Each distinct (sr, n_fft, hop_length) configuration is transformed once per clip and every
+    requested mode is derived from that power spectrogram: the mel modes through the cached mel
+    filterbank and the dB conversion, "stft" through the dB conversion of the power directly.
+    Without `compat`, "stft" and "mfcc" share one STFT. The outputs match the librosa extractors
+    to within float32 rounding (about 1e-3 dB).
+    """
+    configs = STFT_CONFIGS if compat else FAST_STFT_CONFIGS
+    powers = {}
+    features = {}
+    for mode in modes:
+        if mode not in configs:
+            raise ValueError(f"Unsupported mode for the spectral backend: {mode}")
+        sr, n_fft, hop_length = configs[mode]
+        power = powers.get((sr, n_fft, hop_length))
+        if power is None:
+            y, _ = load_audio(source, sr=sr)
+            power = power_spectrogram(y, n_fft, hop_length, workers=workers)
+            powers[(sr, n_fft, hop_length)] = power
+
+        if mode == "melspectrogram":
+            mel_basis = get_kernel("mel", sr=sr, n_fft=n_fft, n_mels=MEL_PARAMS["n_mels"],
+                                   fmin=MEL_PARAMS["fmin"], fmax=MEL_PARAMS["fmax"])
+            with METRICS.stage("db"):
+                features[mode] = librosa.power_to_db(mel_basis @ power, ref=np.max)
+        elif mode == "mfcc":
+            mel_basis = get_kernel("mel", sr=sr, n_fft=n_fft, n_mels=MFCC_PARAMS["n_mels"], fmin=0.0, fmax=None)
+            with METRICS.stage("db"):
+                mel_db = librosa.power_to_db(mel_basis @ power)
+            features[mode] = scipy.fft.dct(mel_db, axis=-2, type=2, norm="ortho")[:n_mfcc].flatten()
+        else:
+            with METRICS.stage("db"):
+                features[mode] = librosa.power_to_db(power, ref=np.max)
+    return features
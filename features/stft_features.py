@@ -1,10 +1,18 @@
 import numpy as np
 import librosa
+from features.audio import load_audio
+from features.instrumentation import METRICS
 
-def stft_features(audio_path,sr=22050,n_fft=2024,hop_length=512):
+STFT_SR = 22050
+STFT_PARAMS = dict(
+    n_fft=2024,      # Number of FFT components
+    hop_length=512,  # Number of samples between successive frames
+)
+
+def stft_features(audio_path,sr=STFT_SR,n_fft=STFT_PARAMS["n_fft"],hop_length=STFT_PARAMS["hop_length"]):
     """
     parameters:
-    audio_path (str): Path to the input audio file.
+    audio_path (str, tuple or DecodedAudio): Path to the input audio file, a decoded (y, sr) pair or a `DecodedAudio` handle.
     sr (int): Sampling rate for loading the audio file. Default is 22050 Hz.
     n_fft (int): Number of FFT components. Default is 2024.
     hop_length (int): Number of samples between successive frames. Default is 512.
@@ -21,8 +29,9 @@ def stft_features(audio_path,sr=22050,n_fft=2024,hop_length=512):
     The function is designed to run on CPU, ensuring compatibility with systems that do not have CUDA support.
     If an error occurs during processing, it will print an error message and return None.   
     """
-    y, sr = librosa.load(audio_path, sr=sr)
+    y, sr = load_audio(audio_path, sr=sr)
     stft_matrix = librosa.stft(y, n_fft=n_fft, hop_length=hop_length)
     stft_magnitude = np.abs(stft_matrix)
-    stft_db = librosa.amplitude_to_db(stft_magnitude, ref=np.max)
+    with METRICS.stage("db"):
+        stft_db = librosa.amplitude_to_db(stft_magnitude, ref=np.max)
     return stft_db
\ No newline at end of file
@@ -0,0 +1,287 @@
+import os
+import math
+from itertools import chain
+import numpy as np
+import librosa
+import soundfile as sf
+import soxr
+from features.kernels import cqt, get_kernel
+from features.cqt_features import CQT_PARAMS, CQT_SR
+from features.melspectrogram import MEL_PARAMS, MEL_SR
+from features.mfcc_features import MFCC_PARAMS, MFCC_SR, N_MFCC
+from features.stft_features import STFT_PARAMS, STFT_SR
+from features.wst_features import WST_PARAMS, WST_SR
+
+STREAM_MODES = ("melspectrogram", "mfcc", "stft", "cqt", "wst")
+
+def stream_audio(path, sr=22050, block_seconds=30.0):
+    """
+    parameters:
+    path (str): Path to the input audio file (any format soundfile can read, e.g. WAV).
+    sr (float or None): Target sampling rate. None keeps the native sampling rate.
+    block_seconds (float): Length of the blocks read from disk, in seconds of input audio.
+
+    returns:
+    generator: Consecutive mono float32 blocks at `sr`.
+
+    The file is read block by block with soundfile and resampled with a streaming soxr resampler
+    of the same quality librosa uses, so the concatenated blocks are sample-identical to
+    `librosa.load(path, sr=sr)` while only one block is held in memory.
+    """
+    info = sf.info(path)
+    native_sr = info.samplerate
+    resampler = None
+    n_total = info.frames
+    if sr is not None and sr != native_sr:
+        resampler = soxr.ResampleStream(native_sr, sr, 1, dtype="float32", quality="HQ")
+        n_total = int(math.ceil(info.frames * sr / native_sr))  # as librosa.resample(fix=True)
+
+    emitted = 0
+    blocks = sf.blocks(path, blocksize=max(1, int(block_seconds * native_sr)), dtype="float32", always_2d=True)
+    for block in chain(blocks, [None]):
+        if block is None:
+            if resampler is None:
+                break
+            y = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        else:
+            y = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+            if resampler is not None:
+                y = resampler.resample_chunk(y)
+        y = y[:n_total - emitted]
+        emitted += len(y)
+        if len(y):
+            yield y
+    if emitted < n_total:
+        yield np.zeros(n_total - emitted, dtype=np.float32)
+
+def stream_stft(blocks, n_fft, hop_length, window="hann"):
+    """
+    parameters:
+    blocks (iterable): Consecutive audio blocks, e.g. from `stream_audio`.
+    n_fft (int): FFT size.
+    hop_length (int): Number of samples between successive frames.
+    window (str): Window function.
+
+    returns:
+    generator: Consecutive complex STFT blocks of shape (1 + n_fft // 2, n_frames).
+
+    The frames are those of `librosa.stft(y, center=True, pad_mode="constant")` on the whole
+    signal: the stream is zero-padded by n_fft // 2 at both ends, and the samples that later
+    frames still need are carried over from one block to the next.
+    """
+    pad = n_fft // 2
+    buffer = np.zeros(pad, dtype=np.float32)
+    for block in chain(blocks, [np.zeros(pad, dtype=np.float32)]):
+        buffer = np.concatenate([buffer, block])
+        if len(buffer) < n_fft:
+            continue
+        n_frames = 1 + (len(buffer) - n_fft) // hop_length
+        yield librosa.stft(buffer[:(n_frames - 1) * hop_length + n_fft], n_fft=n_fft, hop_length=hop_length,
+                           window=window, center=False)
+        buffer = buffer[n_frames * hop_length:]
+
+def _cqt_context(sr):
+    # Samples of real signal needed on each side of a frame for it to match the whole-file CQT:
+    # the longest wavelet plus margin for the per-octave resampling filters, in whole hops.
+    hop_length = CQT_PARAMS["hop_length"]
+    freqs = librosa.cqt_frequencies(n_bins=CQT_PARAMS["n_bins"], fmin=CQT_PARAMS["fmin"],
+                                    bins_per_octave=CQT_PARAMS["bins_per_octave"])
+    lengths, _ = librosa.filters.wavelet_lengths(freqs=freqs, sr=sr, window=CQT_PARAMS["window"])
+    return int(math.ceil(1.5 * lengths.max() / hop_length)) * hop_length
+
+def stream_cqt(blocks, sr, block_frames=4096):
+    """
+    parameters:
+    blocks (iterable): Consecutive audio blocks at `sr`, e.g. from `stream_audio`.
+    sr (float): Sampling rate of the blocks.
+    block_frames (int): Number of CQT frames computed per call.
+
+    returns:
+    generator: Consecutive complex CQT blocks of shape (n_bins, n_frames), with the parameters of `cqt_features`.
+
+    The CQT is computed over overlapping segments: each segment starts on a frame boundary and
+    carries enough context on both sides for the longest filter and the octave resampling, and
+    only its interior frames are kept. The result matches the whole-file CQT to within float
+    rounding of the resamplers.
+    """
+    hop_length = CQT_PARAMS["hop_length"]
+    context = _cqt_context(sr)
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = 0      # sample index of buffer[0] in the whole signal
+    next_frame = 0
+    for block in chain(blocks, [None]):
+        final = block is None
+        if not final:
+            buffer = np.concatenate([buffer, block])
+        end = buffer_start + len(buffer)
+        while True:
+            if final:
+                stop_frame = 1 + end // hop_length
+            else:
+                stop_frame = min(next_frame + block_frames, (end - context) // hop_length)
+                if stop_frame - next_frame < block_frames:
+                    break
+            if stop_frame <= next_frame:
+                break
+            segment_start = max(0, next_frame * hop_length - context)
+            segment_end = end if final else (stop_frame - 1) * hop_length + context
+            C = cqt(buffer[segment_start - buffer_start:segment_end - buffer_start], sr=sr, **CQT_PARAMS)
+            first = (next_frame * hop_length - segment_start) // hop_length
+            yield C[:, first:first + stop_frame - next_frame]
+            next_frame = stop_frame
+            keep_from = max(0, next_frame * hop_length - context)
+            buffer = buffer[keep_from - buffer_start:]
+            buffer_start = keep_from
+            if final:
+                break
+
+def _to_db(linear, power):
+    # Absolute dB (ref=1.0, no top_db), as librosa computes it before applying ref=np.max.
+    if power:
+        return librosa.power_to_db(linear, ref=1.0, top_db=None)
+    return librosa.amplitude_to_db(linear, ref=1.0, top_db=None)
+
+def _linear_blocks(path, mode, block_seconds, n_fft=STFT_PARAMS["n_fft"], hop_length=STFT_PARAMS["hop_length"], sr=STFT_SR):
+    # Yields (linear block, True if it is a power spectrogram) for the frame-based modes.
+    if mode == "melspectrogram":
+        mel_basis = get_kernel("mel", sr=MEL_SR, n_fft=MEL_PARAMS["n_fft"], n_mels=MEL_PARAMS["n_mels"],
+                               fmin=MEL_PARAMS["fmin"], fmax=MEL_PARAMS["fmax"])
+        for S in stream_stft(stream_audio(path, MEL_SR, block_seconds), MEL_PARAMS["n_fft"],
+                             MEL_PARAMS["hop_length"], MEL_PARAMS["window"]):
+            yield np.einsum("...ft,mf->...mt", np.abs(S) ** 2, mel_basis, optimize=True), True
+    elif mode == "mfcc":
+        mel_basis = get_kernel("mel", sr=MFCC_SR, n_fft=MFCC_PARAMS["n_fft"], n_mels=MFCC_PARAMS["n_mels"],
+                               fmin=0.0, fmax=None)
+        for S in stream_stft(stream_audio(path, MFCC_SR, block_seconds), MFCC_PARAMS["n_fft"], MFCC_PARAMS["hop_length"]):
+            yield np.einsum("...ft,mf->...mt", np.abs(S) ** 2, mel_basis, optimize=True), True
+    elif mode == "stft":
+        for S in stream_stft(stream_audio(path, sr, block_seconds), n_fft, hop_length):
+            yield np.abs(S), False
+    elif mode == "cqt":
+        block_frames = max(1, int(block_seconds * CQT_SR / CQT_PARAMS["hop_length"]))
+        for C in stream_cqt(stream_audio(path, CQT_SR, block_seconds), CQT_SR, block_frames):
+            yield np.abs(C), False
+    else:
+        raise ValueError(f"Unsupported streaming mode: {mode}")
+
+def _mfcc(S_db, n_mfcc):
+    return librosa.feature.mfcc(S=S_db, n_mfcc=n_mfcc)
+
+def stream_features(path, mode, block_seconds=30.0, n_mfcc=N_MFCC, J=WST_PARAMS["J"], Q=WST_PARAMS["Q"], T=WST_PARAMS["T"],
+                    **stft_params):
+    """
+    parameters:
+    path (str): Path to the input audio file.
+    mode (str): One of "melspectrogram", "mfcc", "stft", "cqt" or "wst".
+    block_seconds (float): Amount of input audio read and transformed at a time.
+    n_mfcc (int): Number of MFCC coefficients, as in `extract_mfcc_1d`.
+    J, Q, T: Scattering parameters, as in `wst_features`.
+    **stft_params: `sr`, `n_fft` and `hop_length` for mode "stft", as in `stft_features`.
+
+    returns:
+    generator: Feature blocks in time order.
+        - "melspectrogram", "stft", "cqt": (n_bins, n_frames) blocks in absolute dB (ref=1.0, no top_db).
+        - "mfcc": (n_mfcc, n_frames) blocks computed from absolute-dB mel spectrograms.
+        - "wst": one scattering output per consecutive, non-overlapping T-sample window; the last
+          window is zero-padded.
+
+    This function processes recordings of any length with memory that depends only on
+    `block_seconds`. The whole-file functions scale the dB output to the file's own maximum
+    and clip it 80 dB below, which is only known after the last block; these blocks are therefore
+    unscaled. `extract_streaming` applies that scaling and reproduces the whole-file output.
+    """
+    if mode == "wst":
+        import torch
+        scattering = get_kernel("scattering1d", J=J, T=T, Q=Q)
+        buffer = np.zeros(0, dtype=np.float32)
+        for block in chain(stream_audio(path, stft_params.get("sr", WST_SR), block_seconds), [None]):
+            if block is not None:
+                buffer = np.concatenate([buffer, block])
+            while len(buffer) >= T or (block is None and len(buffer)):
+                window = np.pad(buffer[:T], (0, max(0, T - len(buffer))), mode='constant')
+                buffer = buffer[T:]
+                yield scattering(torch.from_numpy(window)).numpy()
+        return
+
+    for linear, power in _linear_blocks(path, mode, block_seconds, **stft_params):
+        S_db = _to_db(linear, power)
+        yield _mfcc(S_db, n_mfcc) if mode == "mfcc" else S_db
+
+def _n_frames(path, mode, n_fft=STFT_PARAMS["n_fft"], hop_length=STFT_PARAMS["hop_length"], sr=STFT_SR):
+    # Frame count of the whole-file output, known from the header before any audio is read.
+    if mode == "cqt":
+        sr, n_fft, hop_length = CQT_SR, None, CQT_PARAMS["hop_length"]
+    elif mode == "melspectrogram":
+        sr, n_fft, hop_length = MEL_SR, MEL_PARAMS["n_fft"], MEL_PARAMS["hop_length"]
+    elif mode == "mfcc":
+        sr, n_fft, hop_length = MFCC_SR, MFCC_PARAMS["n_fft"], MFCC_PARAMS["hop_length"]
+    info = sf.info(path)
+    n_samples = info.frames
+    if sr != info.samplerate:
+        n_samples = int(math.ceil(info.frames * sr / info.samplerate))
+    if n_fft is None:
+        return 1 + n_samples // hop_length
+    return 1 + (n_samples + 2 * (n_fft // 2) - n_fft) // hop_length
+
+def extract_streaming(path, mode, output_file_path, block_seconds=30.0, n_mfcc=N_MFCC, top_db=80.0, **stft_params):
+    """
+    parameters:
+    path (str): Path to the input audio file.
+    mode (str): One of "melspectrogram", "mfcc", "stft" or "cqt".
+    output_file_path (str): Path of the `.npy` file to write.
+    block_seconds (float): Amount of input audio read and transformed at a time.
+    n_mfcc (int): Number of MFCC coefficients, as in `extract_mfcc_1d`.
+    top_db (float): Dynamic range kept below the maximum, as in librosa's dB conversions.
+    **stft_params: `sr`, `n_fft` and `hop_length` for mode "stft", as in `stft_features`.
+
+    returns:
+    output_file_path (str): The path that was written.
+
+    This function writes the same array the whole-file extractor would return, using memory that
+    does not grow with the file's duration. The first pass streams absolute-dB blocks into a
+    memory-mapped `.npy` and tracks the maximum; the second pass goes over that file, not the
+    audio, and applies the ref=np.max offset and the top_db clipping. For "mfcc" the mel dB values
+    are kept in a temporary memmap and turned into the flattened MFCC array of `extract_mfcc_1d`.
+    """
+    if mode not in ("melspectrogram", "mfcc", "stft", "cqt"):
+        raise ValueError(f"Unsupported streaming mode: {mode}")
+    power = mode in ("melspectrogram", "mfcc")
+    n_frames = _n_frames(path, mode, **stft_params)
+
+    spool_path = output_file_path + ".mel.npy" if mode == "mfcc" else output_file_path
+    spool = None
+    position = 0
+    max_linear = None
+    for linear, _ in _linear_blocks(path, mode, block_seconds, **stft_params):
+        if spool is None:
+            spool = np.lib.format.open_memmap(spool_path, mode="w+", dtype=np.float32, shape=(linear.shape[0], n_frames))
+        spool[:, position:position + linear.shape[1]] = _to_db(linear, power)
+        position += linear.shape[1]
+        block_max = linear.max()
+        max_linear = block_max if max_linear is None else max(max_linear, block_max)
+
+    # Same arithmetic as librosa's power_to_db / amplitude_to_db with ref=np.max. extract_mfcc_1d
+    # uses ref=1.0 instead: no offset, but still top_db clipping relative to the maximum.
+    if mode == "mfcc":
+        offset = np.float32(0.0)
+    elif power:
+        offset = 10.0 * np.log10(np.maximum(1e-10, max_linear))
+    else:
+        offset = 10.0 * np.log10(np.maximum(1e-10, np.square(max_linear)))
+    step = max(1, int(block_seconds * 100))
+    floor = max((spool[:, start:start + step] - offset).max() for start in range(0, n_frames, step)) - top_db
+
+    if mode != "mfcc":
+        for start in range(0, n_frames, step):
+            spool[:, start:start + step] = np.maximum(spool[:, start:start + step] - offset, floor)
+        spool.flush()
+        return output_file_path
+
+    output = np.lib.format.open_memmap(output_file_path, mode="w+", dtype=np.float32, shape=(n_mfcc * n_frames,))
+    coefficients = output.reshape(n_mfcc, n_frames)
+    for start in range(0, n_frames, step):
+        coefficients[:, start:start + step] = _mfcc(np.maximum(spool[:, start:start + step], floor), n_mfcc)
+    output.flush()
+    del output, coefficients, spool
+    os.remove(spool_path)
+    return output_file_path
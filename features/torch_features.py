@@ -0,0 +1,114 @@
+import copy
+import math
+import torch
+from torch import nn
+from features.gammatonegram import GAMMATONE_PARAMS
+from features.kernels import get_kernel
+from features.melspectrogram import MEL_PARAMS, MEL_SR
+from features.stft_features import STFT_PARAMS, STFT_SR
+
+# mode -> default parameters, the same as the `features/` extractor of that mode.
+TORCH_FEATURE_PARAMS = {
+    "melspectrogram": dict(sr=MEL_SR, n_fft=MEL_PARAMS["n_fft"], hop_length=MEL_PARAMS["hop_length"],
+                           n_mels=MEL_PARAMS["n_mels"], fmin=MEL_PARAMS["fmin"], fmax=MEL_PARAMS["fmax"],
+                           top_db=80.0),
+    "stft": dict(sr=STFT_SR, **STFT_PARAMS, top_db=80.0),
+    "gammatonegram": dict(GAMMATONE_PARAMS, sr=None),
+}
+
+def power_to_db(power, frame_lengths, amin=1e-10, top_db=80.0):
+    """
+    `librosa.power_to_db(S, ref=np.max)` of every clip of a (B, F, frames) batch, with the
+    reference and the `top_db` floor taken over each clip's own `frame_lengths` frames only.
+    """
+    log_spec = 10.0 * torch.log10(power.clamp(min=amin))
+    valid = torch.arange(power.shape[-1], device=power.device) < frame_lengths[:, None]
+    masked = log_spec.masked_fill(~valid[:, None, :], -math.inf)
+    ref = masked.amax(dim=(1, 2), keepdim=True)
+    log_spec = log_spec - ref
+    if top_db is not None:
+        log_spec = torch.maximum(log_spec, torch.full_like(ref, -top_db))
+    return log_spec
+
+class TorchFeatureExtractor(nn.Module):
+    """
+    Computes the "melspectrogram", "stft" or "gammatonegram" feature of a batch of waveforms with
+    torch ops, on whatever device the waveforms are on.
+
+    parameters:
+    mode (str): One of `TORCH_FEATURE_PARAMS`.
+    **params: Overrides of the mode's parameters, e.g. `n_mels=64, fmin=30` for "melspectrogram".
+        `sr` is the rate the waveforms must be at; None (Gammatone) takes the file's native rate.
+
+    A call `extractor(waveforms, lengths, sr)` takes a zero-padded (B, T) float32 batch and the
+    number of real samples of every clip, and returns
+    features (torch.Tensor): (B, F, frames) batch, each clip filled with its own minimum past its frames.
+    frame_lengths (torch.Tensor): (B,) number of frames of every clip, `1 + length // hop_length`.
+
+    With the default parameters each clip matches its `features/` function: the STFT is centred
+    and zero-padded like librosa's, the mel filterbank is librosa's and the dB conversion is
+    relative to each clip's own maximum, so padding a batch does not change the mel and STFT
+    features. The Gammatone layer reflect-pads its input, so in a batch of unequal lengths the
+    last frames of the shorter clips can differ slightly from the single-clip result.
+    """
+    def __init__(self, mode="melspectrogram", **params):
+        super().__init__()
+        if mode not in TORCH_FEATURE_PARAMS:
+            raise ValueError(f"Unsupported mode for online extraction: {mode}")
+        unknown = set(params) - set(TORCH_FEATURE_PARAMS[mode])
+        if unknown:
+            raise ValueError(f"Unknown {mode} parameters: {sorted(unknown)}")
+        self.mode = mode
+        self.params = dict(TORCH_FEATURE_PARAMS[mode], **params)
+        self.sr = self.params["sr"]
+        self._kernels = {}
+
+    def _kernel(self, sr, device):
+        # Window, mel basis or Gammatone layer for this rate and device, built once.
+        key = (sr, device)
+        kernel = self._kernels.get(key)
+        if kernel is None:
+            p = self.params
+            if self.mode == "gammatonegram":
+                # A copy: `Module.to` moves in place, and the registry's layer is shared with
+                # `features.gammatonegram`, which runs it on the CPU.
+                kernel = get_kernel("gammatone", sr=sr, **{k: v for k, v in p.items() if k != "sr"})
+                kernel = copy.deepcopy(kernel).to(device)
+            else:
+                window = torch.hann_window(p["n_fft"], periodic=True, device=device)
+                mel_basis = None
+                if self.mode == "melspectrogram":
+                    mel_basis = torch.from_numpy(get_kernel("mel", sr=sr, n_fft=p["n_fft"], n_mels=p["n_mels"],
+                                                            fmin=p["fmin"], fmax=p["fmax"])).to(device)
+                kernel = (window, mel_basis)
+            self._kernels[key] = kernel
+        return kernel
+
+    def forward(self, waveforms, lengths=None, sr=None):
+        if waveforms.dim() == 1:
+            waveforms = waveforms[None]
+        if lengths is None:
+            lengths = torch.full((waveforms.shape[0],), waveforms.shape[-1], dtype=torch.long)
+        lengths = torch.as_tensor(lengths, device=waveforms.device)
+        sr = self.sr if self.sr is not None else sr
+        if sr is None:
+            raise ValueError("The Gammatone mode needs the sampling rate of the waveforms")
+        p = self.params
+        frame_lengths = 1 + lengths // p["hop_length"]
+
+        if self.mode == "gammatonegram":
+            features = self._kernel(sr, waveforms.device)(waveforms)
+        else:
+            window, mel_basis = self._kernel(sr, waveforms.device)
+            spectrum = torch.stft(waveforms, p["n_fft"], hop_length=p["hop_length"], window=window, center=True,
+                                  pad_mode="constant", return_complex=True)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            if mel_basis is not None:
+                power = torch.matmul(mel_basis, power)
+            features = power_to_db(power, frame_lengths, top_db=p["top_db"])
+
+        n_frames = int(frame_lengths.max())
+        features = features[..., :n_frames]
+        valid = torch.arange(n_frames, device=features.device) < frame_lengths[:, None]
+        floor = features.masked_fill(~valid[:, None, :], math.inf).amin(dim=(1, 2), keepdim=True)
+        return torch.where(valid[:, None, :], features, floor), frame_lengths
@@ -1,11 +1,18 @@
 import numpy as np
-import librosa
-from kymatio.torch import Scattering1D
+from features.audio import load_audio
+from features.kernels import get_kernel
 
-def wst_features(audio_path, sr=22050, J=4, Q=6,T=32768):
+WST_SR = 22050
+WST_PARAMS = dict(
+    J=4,      # Number of scales
+    Q=6,      # Number of wavelets per octave
+    T=32768,  # Length of the (zero-padded) signal
+)
+
+def wst_features(audio_path, sr=WST_SR, J=WST_PARAMS["J"], Q=WST_PARAMS["Q"],T=WST_PARAMS["T"]):
     """
     parameters:
-    audio_path (str): Path to the input audio file.
+    audio_path (str, tuple or DecodedAudio): Path to the input audio file, a decoded (y, sr) pair or a `DecodedAudio` handle.
     sr (int): Sampling rate for loading the audio file. Default is 22050 Hz.
     J (int): Number of scales for the scattering transform. Default is 4.
     Q (int): Number of wavelets per octave. Default is 6.
@@ -16,9 +23,15 @@ def wst_features(audio_path, sr=22050, J=4, Q=6,T=32768):
 
     This function computes the scattering transform of an audio file using the kymatio library.
     It loads the audio file, pads it to a specified length, and applies the scattering transform.
+    Signals longer than T are rejected; `features.streaming` processes them window by window.
+    The Scattering1D transform is built once per (J, Q, T) and reused, see `features.kernels`.
     """
-    y, sr = librosa.load(audio_path, sr=sr)
+    import torch  # imported on first use, so the other modes do not pay for it
+    y, sr = load_audio(audio_path, sr=sr)
+    if len(y) > T:
+        raise ValueError(f"Signal of {len(y)} samples is longer than the scattering length T={T}; "
+                         "use features.streaming.stream_features(path, 'wst') for long recordings")
     y = np.pad(y, (0, T - len(y)), mode='constant')
-    scattering = Scattering1D(J=J, shape=(T,), Q=Q)
-    S = scattering(y)
-    return S
\ No newline at end of file
+    scattering = get_kernel("scattering1d", J=J, T=T, Q=Q)
+    S = scattering(torch.from_numpy(y))
+    return S.numpy()
\ No newline at end of file
@@ -0,0 +1,698 @@
+import os
+import time
+import uuid
+import heapq
+import queue
+import importlib
+import threading
+import multiprocessing
+import numpy as np
+from collections.abc import Mapping
+from contextlib import ExitStack
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from features.audio_cache import AudioCache
+from features.instrumentation import METRICS
+from preprocessing.manifest import MANIFEST_FILE, Manifest, file_sha1, file_signature, fingerprint
+from preprocessing.progress import JsonLinesSink, ProgressReporter, log_report
+from processing.FeatureEncoding import feature_extension, save_features
+from processing.FeatureStore import FeatureStoreWriter, remove_unreferenced_shards, write_index
+
+class _LazyExtractors(Mapping):
+    # Mode -> extractor mapping that imports each extractor's module on first lookup, so a run
+    # only loads the backends (torch, kymatio, nnAudio2) of the modes it uses, and a missing
+    # optional backend only breaks the modes that need it.
+    def __init__(self, paths):
+        self._paths = paths
+        self._extractors = {}
+
+    def __getitem__(self, mode):
+        extractor = self._extractors.get(mode)
+        if extractor is None:
+            module_name, function_name = self._paths[mode]
+            extractor = getattr(importlib.import_module(module_name), function_name)
+            self._extractors[mode] = extractor
+        return extractor
+
+    def __contains__(self, mode):
+        # Mapping's default looks the mode up, which would import its backend.
+        return mode in self._paths
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+FEATURE_EXTRACTORS = _LazyExtractors({
+    "melspectrogram": ("features.melspectrogram", "melspectrogram"),
+    "gammatonegram": ("features.gammatonegram", "gammatonegram"),
+    "mfcc": ("features.mfcc_features", "extract_mfcc_1d"),
+    "stft": ("features.stft_features", "stft_features"),
+    "wst": ("features.wst_features", "wst_features"),
+    "cqt": ("features.cqt_features", "cqt_features"),
+})
+
+# Per-process state, set up by `_init_worker` in each worker process: the decoded-audio cache,
+# the reader and writer threads and, for output_format="store", one feature-store writer per
+# output folder.
+_audio_cache = None
+_readers = None
+_writer = None
+_startup_s = 0.0
+_started = None
+_store_writers = {}
+_store_settings = {}
+_run_id = None
+# input_file_path -> `_read_input` future of the file a task asked this worker to decode ahead.
+_prefetched = {}
+
+# Work-size keys for the longest-first ordering of `extract_dataset`.
+ORDERS = ("size", "duration", None)
+
+def find_wav_files(input_folder):
+    """
+    parameters:
+    input_folder (str): Root folder containing the input audio files.
+
+    returns:
+    wav_files (list): Paths of all `.wav` files below `input_folder`, in `os.walk` order.
+    """
+    wav_files = []
+    for root, _, files in os.walk(input_folder):
+        for file_name in files:
+            if file_name.endswith('.wav'):
+                wav_files.append(os.path.join(root, file_name))
+    return wav_files
+
+def iter_wav_files(input_folder):
+    """
+    parameters:
+    input_folder (str): Root folder containing the input audio files.
+
+    yields:
+    (path, size) of every `.wav` file below `input_folder`, as each directory is read with
+    `os.scandir`, so the caller can start on the first files before the whole tree is listed.
+    Files come in sorted path order: a directory's own files, then its sub-directories by name.
+    Like `os.walk`, unreadable directories are skipped and symlinked directories not followed.
+    """
+    folders = [input_folder]
+    while folders:
+        try:
+            entries = list(os.scandir(folders.pop()))
+        except OSError:
+            continue
+        subfolders = []
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subfolders.append(entry.path)
+                elif entry.name.endswith('.wav'):
+                    yield entry.path, entry.stat().st_size
+            except OSError:
+                continue
+        # Pushed in reverse so the stack pops them in name order.
+        folders.extend(reversed(subfolders))
+
+def work_size(input_file_path, size, order="size"):
+    """
+    Scheduling key of an input file: its size in bytes (order="size"), its duration in seconds
+    from the WAV header (order="duration", falling back to the size for unreadable headers), or 0
+    (order=None, first come first served).
+    """
+    if order == "duration":
+        import soundfile as sf
+        try:
+            return sf.info(input_file_path).duration
+        except Exception:
+            return size
+    return size if order == "size" else 0
+
+def check_modes(modes):
+    """
+    parameters:
+    modes (list): Feature modes requested by the caller.
+
+    returns:
+    tuple: The modes, validated against `FEATURE_EXTRACTORS`.
+
+    Raises a ValueError for an unknown mode before any work is scheduled.
+    """
+    modes = tuple(modes)
+    for mode in modes:
+        if mode not in FEATURE_EXTRACTORS:
+            raise ValueError(f"Unsupported mode: {mode}")
+    return modes
+
+def output_path(input_file_path, input_folder, output_folder, mode, n_modes=1, extension=".npy"):
+    """
+    parameters:
+    input_file_path (str): Path to the input audio file.
+    input_folder (str): Root folder containing the input audio files.
+    output_folder (str): Root folder where the output files will be saved.
+    mode (str): Feature mode the output belongs to.
+    n_modes (int): Number of modes extracted in the same run.
+    extension (str): File extension, see `processing.FeatureEncoding.feature_extension`.
+
+    returns:
+    str: Path of the `.npy` (or `.npz`) file for this input and mode.
+
+    With a single mode the layout is the same as `process_file`: the input folder structure is
+    mirrored directly under `output_folder`. With several modes each mode gets its own
+    `output_folder/<mode>` tree so the outputs do not overwrite each other.
+    """
+    relative_path = os.path.relpath(os.path.dirname(input_file_path), input_folder)
+    if n_modes > 1:
+        output_folder = os.path.join(output_folder, mode)
+    file_name = os.path.basename(input_file_path).replace('.wav', extension)
+    return os.path.join(output_folder, relative_path, file_name)
+
+def store_path(output_folder, mode, n_modes=1):
+    """Folder of the feature store for `mode`: `output_folder` itself, or `output_folder/<mode>` when several modes are extracted."""
+    return os.path.join(output_folder, mode) if n_modes > 1 else output_folder
+
+def class_name(input_file_path, input_folder):
+    """Class of an input file: the first folder below `input_folder`, as used by `MelSpectrogramDataset`."""
+    relative_dir = os.path.dirname(os.path.relpath(input_file_path, input_folder))
+    return relative_dir.split(os.sep)[0]
+
+def backend_options(mode, backend="librosa", fft_compat=True):
+    """Fingerprint options of the feature backend: empty for the default librosa extractors, so existing manifests stay current."""
+    if backend == "librosa":
+        return {}
+    if backend != "numpy":
+        raise ValueError(f"Unsupported backend: {backend}")
+    from features.spectral import SPECTRAL_MODES
+    return {"backend": backend, "fft_compat": fft_compat} if mode in SPECTRAL_MODES else {}
+
+def _shared_spectral(audio, modes, backend, fft_compat):
+    # Features of the spectral modes computed together by `features.spectral`, or {} when the
+    # librosa extractors are used.
+    if backend != "numpy":
+        return {}
+    from features.spectral import SPECTRAL_MODES, spectral_features
+    modes = [mode for mode in modes if mode in SPECTRAL_MODES]
+    return spectral_features(audio, modes, compat=fft_compat) if modes else {}
+
+def extract_features(input_file_path, modes, audio_cache=None, backend="librosa", fft_compat=True):
+    """
+    parameters:
+    input_file_path (str): Path to the input audio file.
+    modes (list): Feature modes to compute, see `FEATURE_EXTRACTORS`.
+    audio_cache (AudioCache, optional): Decoded-audio cache to use. Defaults to a fresh cache.
+    backend (str): "librosa" runs every mode's extractor. "numpy" computes the mel, MFCC and STFT
+        modes together with `features.spectral.spectral_features`, sharing their STFTs.
+    fft_compat (bool): With the "numpy" backend, keep the STFT sizes of the librosa extractors
+        (n_fft=2024 for "stft"). False gives "stft" the 2048-point "mfcc" STFT.
+
+    returns:
+    dict: Mapping from mode to the extracted feature array (None if the extractor failed).
+
+    The file is decoded once at its native sampling rate and every extractor is served from the
+    audio cache, so each distinct target rate is resampled only once.
+    """
+    if audio_cache is None:
+        audio_cache = AudioCache()
+    audio = audio_cache.open(input_file_path)
+    features = _shared_spectral(audio, modes, backend, fft_compat)
+    return {mode: features[mode] if mode in features else FEATURE_EXTRACTORS[mode](audio) for mode in modes}
+
+def _warm_up():
+    # librosa imports its decoder and resampler lazily, on the first `librosa.load` and
+    # `librosa.resample`; decoding and resampling a tiny in-memory WAV here keeps the seconds
+    # that takes out of the first task's read wait and busy time.
+    import io
+    import librosa
+    import soundfile as sf
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(1024, dtype=np.float32), 22050, format="WAV")
+    buffer.seek(0)
+    y, sr = librosa.load(buffer, sr=None)
+    librosa.resample(y, orig_sr=sr, target_sr=16000, res_type=_audio_cache.res_type)
+
+def _init_worker(audio_cache_bytes, audio_cache_dir, store_dtype="float32", shard_bytes=1 << 30, io_threads=2,
+                 run_id=None):
+    global _audio_cache, _readers, _writer, _startup_s, _started, _run_id
+    start = time.perf_counter()
+    _audio_cache = AudioCache(max_bytes=audio_cache_bytes, cache_dir=audio_cache_dir)
+    _warm_up()
+    _started = time.perf_counter()
+    _startup_s = _started - start
+    _readers = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="read")
+    # A single writer keeps the feature-store writers single-threaded.
+    _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="write")
+    _store_settings.update(dtype=store_dtype, shard_bytes=shard_bytes)
+    _run_id = run_id
+
+def _store_writer(store_dir):
+    writer = _store_writers.get(store_dir)
+    if writer is None:
+        # Named per run and worker: a later run never appends to the shards of an earlier one,
+        # whose unreferenced shards are removed when the index is rewritten.
+        writer = FeatureStoreWriter(store_dir, prefix=f"shard-{_run_id}-{os.getpid()}", **_store_settings)
+        _store_writers[store_dir] = writer
+    return writer
+
+def _write_output(spec, input_file_path, input_folder, output_folder, mode, n_modes, output_format,
+                  encoding=None, compress=False):
+    with METRICS.stage("write"):
+        if output_format == "store":
+            writer = _store_writer(store_path(output_folder, mode, n_modes))
+            entry = writer.add(os.path.relpath(input_file_path, input_folder), spec)
+            METRICS.count("bytes_written", int(np.prod(entry["shape"])) * writer.dtype.itemsize)
+            return entry
+        output_file_path = output_path(input_file_path, input_folder, output_folder, mode, n_modes,
+                                       feature_extension(encoding, compress))
+        os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+        save_features(output_file_path, spec, encoding, compress)
+        METRICS.count("bytes_written", os.path.getsize(output_file_path))
+        return output_file_path
+
+def _read_input(input_file_path, hash_inputs):
+    # Runs on a reader thread: decodes the file into a handle that pins the samples, so the
+    # compute thread never decodes it again, even when it is larger than the audio cache.
+    audio = _audio_cache.open(input_file_path)
+    audio.load(None)
+    return audio, file_sha1(input_file_path) if hash_inputs else None
+
+def _shared_output(shared, mode):
+    # The `mode` feature of a `_shared_spectral` result, or its error.
+    if isinstance(shared, Exception):
+        raise shared
+    return shared[mode]
+
+def _process_chunk(chunk, input_folder, output_folder, modes, batched=False, output_format="npy", hash_inputs=False,
+                   encoding=None, compress=False, backend="librosa", fft_compat=True, prefetch=None):
+    # Runs inside a worker process: nothing is printed, everything is reported back in the results,
+    # together with the worker's metrics and its busy and I/O wait time for this chunk. `chunk`
+    # holds (input_file_path, modes to compute for it); `modes` are all modes of the run, which
+    # decide the output layout. The reader threads decode the next files and the writer thread
+    # saves the previous outputs while this thread computes. `prefetch` is the first file of this
+    # worker's next task, decoded ahead so a single-file task does not start with a blocking read.
+    chunk_start = time.perf_counter()
+    read_wait = 0.0
+    results = []
+    reads = []
+    for input_file_path, file_modes in chunk:
+        result = {"path": input_file_path, "outputs": {}, "errors": {}}
+        results.append(result)
+        read = _prefetched.pop(input_file_path, None) or _readers.submit(_read_input, input_file_path, hash_inputs)
+        reads.append((result, file_modes, read))
+    # A prefetch not claimed by this task went to another worker.
+    for read in _prefetched.values():
+        read.cancel()
+    _prefetched.clear()
+    if prefetch is not None:
+        _prefetched[prefetch] = _readers.submit(_read_input, prefetch, hash_inputs)
+
+    writes = []
+
+    def output(result, mode, compute):
+        try:
+            spec = compute()
+            if spec is None:
+                raise RuntimeError(f"{mode} extractor returned no output")
+            writes.append((result, mode, _writer.submit(_write_output, spec, result["path"], input_folder, output_folder,
+                                                        mode, len(modes), output_format, encoding, compress)))
+        except Exception as e:
+            result["errors"][mode] = f"{type(e).__name__}: {e}"
+            METRICS.failure(e)
+
+    def extract(mode, audio):
+        with METRICS.stage("transform"):
+            return FEATURE_EXTRACTORS[mode](audio)
+
+    decoded = []
+    for result, file_modes, read in reads:
+        wait_start = time.perf_counter()
+        try:
+            audio, sha1 = read.result()
+        except Exception as e:
+            result["errors"] = {mode: f"{type(e).__name__}: {e}" for mode in file_modes}
+            METRICS.failure(e)
+            continue
+        finally:
+            read_wait += time.perf_counter() - wait_start
+        if sha1 is not None:
+            result["sha1"] = sha1
+
+        # With the "numpy" backend the spectral modes of a file are computed together, from shared STFTs.
+        shared = {}
+        if backend == "numpy":
+            try:
+                with METRICS.stage("transform"):
+                    shared = _shared_spectral(audio, file_modes, backend, fft_compat)
+            except Exception as e:
+                shared = e  # raised again for each of the file's spectral modes
+        if batched:
+            decoded.append((result, audio, file_modes, shared))
+            continue
+        for mode in file_modes:
+            if backend_options(mode, backend, fft_compat):
+                output(result, mode, lambda: _shared_output(shared, mode))
+            else:
+                output(result, mode, lambda: extract(mode, audio))
+        audio.release()  # the samples of a done file need not outlive the task
+
+    # Batched: every mode is transformed once for all decoded files of the chunk.
+    for mode in modes if batched else ():
+        todo = [(result, audio, shared) for result, audio, file_modes, shared in decoded if mode in file_modes]
+        if backend_options(mode, backend, fft_compat):
+            for result, _, shared in todo:
+                output(result, mode, lambda: _shared_output(shared, mode))
+            continue
+        specs = None
+        if todo:
+            from features.batch import extract_batch
+            try:
+                with METRICS.stage("transform"):
+                    specs = extract_batch([audio for _, audio, _ in todo], mode)
+            except Exception:
+                specs = None  # redo the chunk file by file so the error is attributed to the right file
+        for i, (result, audio, _) in enumerate(todo):
+            output(result, mode, (lambda: specs[i]) if specs is not None else (lambda: extract(mode, audio)))
+
+    wait_start = time.perf_counter()
+    for result, mode, write in writes:
+        try:
+            result["outputs"][mode] = write.result()
+            METRICS.count("outputs")
+        except Exception as e:
+            result["errors"][mode] = f"{type(e).__name__}: {e}"
+            METRICS.failure(e)
+    # Shard files are closed after every chunk so the parent can index them at any point.
+    for writer in _store_writers.values():
+        writer.close()
+    write_wait = time.perf_counter() - wait_start
+
+    chunk_end = time.perf_counter()
+    elapsed = chunk_end - chunk_start
+    global _startup_s
+    worker = {"pid": os.getpid(), "chunks": 1, "files": len(chunk), "busy_s": elapsed - read_wait - write_wait,
+              "read_wait_s": read_wait, "write_wait_s": write_wait, "startup_s": _startup_s,
+              "lifetime_s": chunk_end - _started}
+    _startup_s = 0.0  # reported with the first task only
+    return results, METRICS.snapshot(reset=True), worker
+
+def _write_store_index(store_dir, written, input_folder, store_dtype):
+    # `written` holds (input_file_path, index entry) pairs.
+    classes = sorted({class_name(path, input_folder) for path, _ in written})
+    class_ids = {name: i for i, name in enumerate(classes)}
+    labels = [class_ids[class_name(path, input_folder)] for path, _ in written]
+    entries = [entry for _, entry in written]
+    write_index(store_dir, entries, labels, classes, store_dtype)
+    remove_unreferenced_shards(store_dir, entries)
+
+def extract_dataset(input_folder, output_folder, modes=("melspectrogram",), max_workers=None, chunksize=8, wav_files=None,
+                    audio_cache_bytes=256 * 1024 ** 2, audio_cache_dir=None, batched=False,
+                    output_format="npy", store_dtype="float32", shard_bytes=1 << 30,
+                    incremental=True, hash_inputs=False, metrics_path=None, report_every=30.0, hooks=None,
+                    encoding=None, compress=False, backend="librosa", fft_compat=True,
+                    order="size", chunk_bytes=16 << 20, max_in_flight=None, io_threads=2):
+    """
+    parameters:
+    input_folder (str): Root folder containing the input audio files.
+    output_folder (str): Root folder where the output files will be saved.
+    modes (list): Feature modes to compute for every file, see `FEATURE_EXTRACTORS`.
+    max_workers (int, optional): Number of worker processes. Defaults to `os.cpu_count()`.
+    chunksize (int): Maximum number of files handed to a worker per task.
+    wav_files (list, optional): Files to process. Defaults to every `.wav` file below `input_folder`,
+        found with `iter_wav_files` while the first files are already being processed.
+    audio_cache_bytes (int): In-memory budget of each worker's decoded-audio cache.
+    audio_cache_dir (str, optional): Folder for the on-disk float32 audio cache, shared by all workers.
+    batched (bool): If True, each chunk is transformed as one batch per mode with
+        `features.batch.extract_batch`, which pays off for chunks of equal-length clips.
+    output_format (str): "npy" writes one `.npy` per input file, mirroring the input tree.
+        "store" writes a sharded feature store (see `processing.FeatureStore`) per mode instead,
+        readable with `processing.FeatureStoreDataset.FeatureStoreDataset`.
+    store_dtype (str): Dtype of the feature store shards, "float32" or "float16" (half the
+        size, ~3 significant digits). Shards are named per run; once the index is written, the
+        shards it no longer references, e.g. of outputs rewritten by this run, are deleted.
+    encoding (str, optional): Encoding of the "npy" outputs, see `processing.FeatureEncoding`:
+        None (plain `.npy` of the extractor's output, as before), "float32", "float16", or
+        "uint8"/"uint16" quantised with a per-file scale and offset (written as `.npz`).
+    compress (bool): Write the "npy" outputs as deflate-compressed `.npz` files.
+    backend (str): "librosa" runs each mode's extractor. "numpy" computes the "melspectrogram",
+        "mfcc" and "stft" modes of a file together with `features.spectral.spectral_features`,
+        which transforms each distinct STFT configuration once with scipy.fft; the other modes
+        still use their extractors. The outputs match librosa to within float32 rounding.
+    fft_compat (bool): With the "numpy" backend, keep the STFT sizes of the librosa extractors,
+        so "stft" outputs keep their shape. False computes "stft" from the 2048-point "mfcc" STFT
+        instead of n_fft=2024, which is faster and shared, but adds 12 frequency bins.
+    order (str or None): Longest-first key of the files waiting to be scheduled: "size" (file size),
+        "duration" (from the WAV header) or None (discovery order).
+    chunk_bytes (int): Upper bound on the input bytes of one task. A task takes files, longest
+        first, until it holds `chunksize` files or its share of the pending work: the bytes
+        waiting to be scheduled divided by twice the number of workers, but at most `chunk_bytes`
+        (guided self-scheduling). Long recordings thus go alone, short ones in groups, and the
+        tasks shrink as the backlog drains, which evens out the workers' finishing times. The
+        share only counts discovered files, so submission starts once discovery has finished or
+        `max_in_flight * chunksize` files are waiting.
+    max_in_flight (int, optional): Maximum number of tasks submitted to the workers and not yet
+        collected, which bounds the memory held by queued work and results. Defaults to one per
+        worker: a worker gets its next task as soon as it returns one, and has been decoding
+        that task's first file meanwhile. Larger values queue tasks behind a busy worker.
+    io_threads (int): Reader threads per worker that decode the next files of a task, and the
+        first file of the worker's next task, while the worker computes; a further writer
+        thread per worker saves the outputs. A decoded file stays pinned in memory until its
+        features are computed, whatever `audio_cache_bytes` is.
+    shard_bytes (int): Size at which a worker starts a new shard file.
+    incremental (bool): If True, outputs recorded as current in `output_folder/manifest.jsonl`
+        are skipped and every new output is recorded there as soon as it is written.
+    hash_inputs (bool): If True, the manifest also stores a SHA-1 of each input, so an input whose
+        mtime changed but whose content did not is still skipped.
+    metrics_path (str, optional): JSON-lines file to append the progress and summary reports to.
+    report_every (float): Seconds between two progress reports.
+    hooks (list, optional): Callables receiving every report dict (see
+        `preprocessing.progress.ProgressReporter`). Defaults to `log_report`, which logs one INFO
+        line per report on the "preprocessing" logger.
+
+    returns:
+    results (list): One dict per processed input file, in input order, with keys
+        - "path": the input file path
+        - "outputs": mapping from mode to the saved `.npy`/`.npz` path, or to the feature-store index entry
+        - "errors": mapping from mode to an error message for the modes that failed
+        Files whose outputs were all current are not processed and not listed.
+
+    This function extracts features for a whole dataset with a pool of worker processes, so the
+    CPU-bound librosa/NumPy/torch work is not serialised by the GIL. Each file is decoded once and
+    all requested modes are computed from that decode through a per-worker `AudioCache`, which
+    also resamples it once per distinct target rate. Files are submitted in chunks to keep the
+    scheduling overhead low for datasets of many short clips.
+    The input tree is listed, and with order="duration" the WAV headers read, by a discovery
+    thread while the workers already process the first files. Of the files discovered but not
+    yet submitted, the longest go first, so a long
+    recording does not start last and keep one core busy after the others are done. At most
+    `max_in_flight` tasks are queued at a time; more are submitted as results come back.
+    The summary report lists every worker's start-up time, its busy time, its time waiting on
+    reads and writes and its utilization, the busy share of the worker's own lifetime from the
+    end of its start-up to the end of its last task.
+    With `incremental=True` (see `preprocessing.manifest`), an output is current when the input's
+    size and mtime (or content hash), the mode's parameter fingerprint and the output location
+    all match the manifest. Re-running after new or changed WAVs, a parameter change or a crash
+    only computes what is missing.
+    Every worker times the load, resample, transform, dB conversion and write stages and counts
+    bytes read and written and failures by exception type (see `features.instrumentation`). The
+    counts come back with each chunk and are reported with the throughput and ETA every
+    `report_every` seconds, and once more as a summary at the end.
+    The pool uses the "spawn" start method, which is safe with torch and on every platform;
+    scripts calling this function must therefore guard their entry point with
+    `if __name__ == "__main__":`.
+    """
+    if output_format not in ("npy", "store"):
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if order not in ORDERS:
+        raise ValueError(f"Unsupported order: {order}")
+    extension = feature_extension(encoding, compress)
+    modes = check_modes(modes)
+
+    def output_location(input_file_path, mode):
+        if output_format == "store":
+            return store_path(output_folder, mode, len(modes))
+        return output_path(input_file_path, input_folder, output_folder, mode, len(modes), extension)
+
+    output_options = {"format": output_format, "dtype": store_dtype if output_format == "store" else None}
+    if output_format == "npy" and (encoding is not None or compress):
+        # Only recorded when set, so manifests written before these options existed stay current.
+        output_options.update(encoding=encoding, compress=compress)
+    fingerprints = {mode: fingerprint(mode, FEATURE_EXTRACTORS[mode], **output_options,
+                                      **backend_options(mode, backend, fft_compat)) for mode in modes}
+    manifest = Manifest(os.path.join(output_folder, MANIFEST_FILE)) if incremental else None
+
+    n_workers = max_workers or os.cpu_count() or 1
+    if max_in_flight is None:
+        max_in_flight = n_workers
+    # Tasks queued on each worker, including the one it runs.
+    depth = max(1, -(-max_in_flight // n_workers))
+
+    # Tasks are only submitted once this many files are waiting, or discovery is over, so the
+    # first tasks are sized from a real backlog.
+    min_backlog = max_in_flight * chunksize
+
+    # The discovery thread feeds (path, size, work size) triples, then None, into `discovered`.
+    discovered = queue.Queue()
+
+    def sized(input_file_path):
+        try:
+            return input_file_path, os.path.getsize(input_file_path)
+        except OSError:
+            return input_file_path, 0
+
+    def discover():
+        try:
+            files = iter_wav_files(input_folder) if wav_files is None else map(sized, wav_files)
+            for input_file_path, size in files:
+                discovered.put((input_file_path, size, work_size(input_file_path, size, order)))
+        except BaseException as e:
+            discovered.put(e)
+        discovered.put(None)
+
+    if hooks is None:
+        hooks = [log_report]
+    hooks = list(hooks)
+    if metrics_path is not None:
+        hooks.append(JsonLinesSink(metrics_path))
+    reporter = ProgressReporter(0, hooks=hooks, report_every=report_every)
+
+    all_files = []  # every discovered input, in discovery order
+    pending = []    # heap of (-work size, discovery index, input_file_path, file_modes, size)
+    pending_bytes = 0
+    signatures = {}
+
+    def accept(input_file_path, size, key):
+        nonlocal pending_bytes
+        all_files.append(input_file_path)
+        file_modes = modes
+        if manifest is not None:
+            try:
+                signatures[input_file_path] = file_signature(input_file_path)
+            except OSError:
+                signatures[input_file_path] = None
+            else:
+                input_key = os.path.relpath(input_file_path, input_folder)
+                file_modes = tuple(mode for mode in modes if not manifest.is_current(
+                    input_key, mode, input_file_path, signatures[input_file_path], fingerprints[mode],
+                    output_location(input_file_path, mode), hash_inputs))
+        if not file_modes:
+            reporter.metrics.count("files_skipped")
+            return
+        reporter.files_total += 1
+        pending_bytes += size
+        heapq.heappush(pending, (-key, len(all_files), input_file_path, file_modes, size))
+
+    # Heap entry each worker has been told to decode ahead: the first file of its next task.
+    heads = [None] * n_workers
+
+    def take():
+        nonlocal pending_bytes
+        entry = heapq.heappop(pending)
+        pending_bytes -= entry[4]
+        return entry
+
+    def next_chunk(worker):
+        # The worker's reserved file, or another worker's once nothing else is left (that
+        # worker's prefetch is then wasted, but no worker idles while work remains), and
+        # whatever fits its share of the pending work. The next file is reserved for this worker.
+        target = min(chunk_bytes, pending_bytes / (2 * n_workers))
+        head, heads[worker] = heads[worker], None
+        if head is None and not pending:
+            other = next(other for other, entry in enumerate(heads) if entry is not None)
+            head, heads[other] = heads[other], None
+        entries = [head if head is not None else take()]
+        chunk_size = entries[0][4]
+        while pending and len(entries) < chunksize and chunk_size + pending[0][4] <= target:
+            entries.append(take())
+            chunk_size += entries[-1][4]
+        if pending:
+            heads[worker] = take()
+        chunk = [(input_file_path, file_modes) for _, _, input_file_path, file_modes, _ in entries]
+        return chunk, heads[worker][2] if heads[worker] is not None else None
+
+    def collect(future):
+        chunk_results, snapshot, worker = future.result()
+        results.extend(chunk_results)
+        reporter.update(len(chunk_results), snapshot, worker)
+        if manifest is None:
+            return
+        # Record each chunk as soon as it is back, so a crash loses at most the chunks in flight.
+        for result in chunk_results:
+            input_file_path = result["path"]
+            if signatures.get(input_file_path) is None:
+                continue
+            input_key = os.path.relpath(input_file_path, input_folder)
+            for mode, location in result["outputs"].items():
+                manifest.add(input_key, mode, signatures[input_file_path], fingerprints[mode],
+                             output_location(input_file_path, mode), location, result.get("sha1"))
+
+    results = []
+    try:
+        threading.Thread(target=discover, name="discover", daemon=True).start()
+        context = multiprocessing.get_context("spawn")
+        run_id = uuid.uuid4().hex[:8]
+        with ExitStack() as stack:
+            # One single-process pool per worker, so each task can be sent to the worker that
+            # has been decoding its first file.
+            executors = [stack.enter_context(ProcessPoolExecutor(
+                max_workers=1, mp_context=context, initializer=_init_worker,
+                initargs=(audio_cache_bytes, audio_cache_dir, store_dtype, shard_bytes, io_threads, run_id)))
+                for _ in range(n_workers)]
+            in_flight = {}  # future -> worker
+            load = [0] * n_workers
+            discovering = True
+            while True:
+                # Take in what was discovered; block only when there is nothing else to do.
+                while discovering:
+                    try:
+                        item = discovered.get(block=not in_flight and len(pending) < min_backlog
+                                              and all(head is None for head in heads))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        discovering = False
+                    elif isinstance(item, BaseException):
+                        raise item
+                    else:
+                        accept(*item)
+                ready = not discovering or len(pending) >= min_backlog
+                for worker, executor in enumerate(executors):
+                    while load[worker] < depth and (heads[worker] is not None or ready and (
+                            pending or any(head is not None for head in heads))):
+                        chunk, prefetch = next_chunk(worker)
+                        future = executor.submit(_process_chunk, chunk, input_folder, output_folder, modes, batched,
+                                                 output_format, hash_inputs and incremental, encoding, compress,
+                                                 backend, fft_compat, prefetch)
+                        in_flight[future] = worker
+                        load[worker] += 1
+                if not in_flight:
+                    if discovering:
+                        continue
+                    break
+                # While discovering, wake up regularly to schedule the newly found files.
+                done, _ = wait(list(in_flight), timeout=0.05 if discovering else None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    load[in_flight.pop(future)] -= 1
+                    collect(future)
+    finally:
+        if manifest is not None:
+            manifest.close()
+        reporter.close()
+
+    position = {input_file_path: i for i, input_file_path in enumerate(all_files)}
+    results.sort(key=lambda result: position[result["path"]])
+
+    if output_format == "store":
+        for mode in modes:
+            if manifest is not None:
+                # Index every current output of this dataset, including those written by earlier runs.
+                written = []
+                for input_file_path in all_files:
+                    record = manifest.lookup(os.path.relpath(input_file_path, input_folder), mode)
+                    signature = signatures.get(input_file_path)
+                    if record is not None and signature is not None \
+                            and record["fingerprint"] == fingerprints[mode] \
+                            and record["output"] == output_location(input_file_path, mode) \
+                            and (record["size"], record["mtime_ns"]) == (signature["size"], signature["mtime_ns"]):
+                        written.append((input_file_path, record["location"]))
+            else:
+                written = [(result["path"], result["outputs"][mode]) for result in results if mode in result["outputs"]]
+            _write_store_index(store_path(output_folder, mode, len(modes)), written, input_folder, store_dtype)
+    return results
@@ -0,0 +1,156 @@
+import os
+import json
+import hashlib
+import inspect
+from features.cqt_features import CQT_PARAMS, CQT_SR
+from features.gammatonegram import GAMMATONE_PARAMS
+from features.melspectrogram import MEL_PARAMS, MEL_SR
+from features.mfcc_features import MFCC_PARAMS, MFCC_SR
+
+MANIFEST_FILE = "manifest.jsonl"
+
+# Parameters hard-coded inside the extractors; the keyword defaults of each extractor are added
+# by `feature_params`.
+_MODE_PARAMS = {
+    "melspectrogram": dict(sr=MEL_SR, **MEL_PARAMS),
+    "cqt": dict(sr=CQT_SR, **CQT_PARAMS),
+    "mfcc": dict(sr=MFCC_SR, **MFCC_PARAMS),
+    "gammatonegram": dict(sr=None, **GAMMATONE_PARAMS),
+}
+
+def feature_params(mode, extractor):
+    """
+    parameters:
+    mode (str): Feature mode.
+    extractor (callable): The extractor function of the mode.
+
+    returns:
+    dict: Every parameter the mode's output depends on: the values hard-coded in `features/`
+    plus the keyword defaults of the extractor (e.g. `n_mfcc`, `n_fft`, `J`).
+    """
+    params = {name: parameter.default for name, parameter in inspect.signature(extractor).parameters.items()
+              if parameter.default is not inspect.Parameter.empty}
+    params.update(_MODE_PARAMS.get(mode, {}))
+    return params
+
+def fingerprint(mode, extractor, **output_options):
+    """
+    parameters:
+    mode (str): Feature mode.
+    extractor (callable): The extractor function of the mode.
+    **output_options: Settings that change the stored output, e.g. the output format and dtype.
+
+    returns:
+    str: Hex digest identifying the mode, its extraction parameters and the output options.
+    An output whose recorded fingerprint differs was produced with other settings and is stale.
+    """
+    payload = {"mode": mode, "params": feature_params(mode, extractor), "output": output_options}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=repr).encode()).hexdigest()
+
+def file_signature(path):
+    """Cheap change detector for an input file: its size and modification time."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def file_sha1(path, block_size=1 << 20):
+    """Content hash of an input file."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _location_exists(record):
+    location = record["location"]
+    if isinstance(location, str):
+        return os.path.exists(location)
+    return os.path.exists(os.path.join(record["output"], location["shard"]))
+
+class Manifest:
+    """
+    Append-only JSON-lines record of the outputs a preprocessing run has produced.
+
+    One line is written per (input, mode) as soon as its output is on disk, with the input's
+    size, mtime and optionally SHA-1, the mode, the parameter fingerprint and the output
+    location. The last line for an (input, mode) wins, so a re-run, or a run resumed after a
+    crash, can skip every output that is still current. A line cut short by a crash is dropped
+    from the file on opening, so the next record starts on a line of its own.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self._hashes = {}
+        if os.path.exists(path):
+            with open(path, "rb+") as f:
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+                if end < len(data):
+                    f.truncate(end)
+            for line in data[:end].splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.records[(record["input"], record["mode"])] = record
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a")
+
+    def lookup(self, input_key, mode):
+        return self.records.get((input_key, mode))
+
+    def is_current(self, input_key, mode, input_file_path, signature, fingerprint, output, hash_inputs=False):
+        """
+        parameters:
+        input_key (str): Input file path relative to the input folder.
+        mode (str): Feature mode.
+        input_file_path (str): Path of the input file, used to hash it when its signature changed.
+        signature (dict): Current `file_signature` of the input.
+        fingerprint (str): Current parameter fingerprint of the mode.
+        output (str): Where the output of this run would go (the `.npy` path or the feature-store
+            folder); a record pointing elsewhere is stale.
+        hash_inputs (bool): If True, an input whose size/mtime changed is still current when its
+            content hash matches the recorded one (e.g. after a copy or `touch`).
+
+        returns:
+        bool: True if the recorded output can be reused.
+        """
+        record = self.lookup(input_key, mode)
+        if record is None or record["fingerprint"] != fingerprint or record["output"] != output:
+            return False
+        if not _location_exists(record):
+            return False
+        if record["size"] == signature["size"] and record["mtime_ns"] == signature["mtime_ns"]:
+            return True
+        if hash_inputs and record.get("sha1") is not None and record["size"] == signature["size"]:
+            sha1 = self._hash(input_file_path, signature)
+            if sha1 == record["sha1"]:
+                self.add(input_key, mode, signature, fingerprint, record["output"], record["location"], sha1)
+                return True
+        return False
+
+    def _hash(self, input_file_path, signature):
+        # Every mode of a touched file asks for the same hash; compute it once.
+        key = (input_file_path, signature["size"], signature["mtime_ns"])
+        if key not in self._hashes:
+            self._hashes[key] = file_sha1(input_file_path)
+        return self._hashes[key]
+
+    def add(self, input_key, mode, signature, fingerprint, output, location, sha1=None):
+        """
+        Records one finished output. `output` identifies where it was meant to go (compared by
+        `is_current`), `location` is what was written there: the `.npy` path or the feature-store index entry.
+        """
+        record = {"input": input_key, "mode": mode, "size": signature["size"], "mtime_ns": signature["mtime_ns"],
+                  "sha1": sha1, "fingerprint": fingerprint, "output": output, "location": location}
+        self.records[(input_key, mode)] = record
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
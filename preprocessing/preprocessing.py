@@ -1,12 +1,13 @@
 import os
-import numpy as np
-import librosa
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from features import melspectrogram, gammatonegram, extract_mfcc_1d, stft_features, wst_features, cqt_features
+from features.instrumentation import METRICS
+from preprocessing.engine import FEATURE_EXTRACTORS, check_modes, extract_dataset, find_wav_files, output_path
+from preprocessing.manifest import MANIFEST_FILE, Manifest, file_signature, fingerprint
+from preprocessing.progress import JsonLinesSink, ProgressReporter, log_report
+from processing.FeatureEncoding import feature_extension, save_features
 
 # Create output directory if it doesn't exist
 
-def process_file(input_file_path, input_folder, output_folder, mode="melspectrogram"):
+def process_file(input_file_path, input_folder, output_folder, mode="melspectrogram", encoding=None, compress=False):
     """
     parameters:
     input_file_path (str): Path to the input audio file.
@@ -19,14 +20,18 @@ def process_file(input_file_path, input_folder, output_folder, mode="melspectrog
         - "stft"
         - "wst"
         - "cqt"
+    encoding (str, optional): Output encoding, see `processing.FeatureEncoding`. None saves the
+        extractor's output as is.
+    compress (bool): Save a deflate-compressed `.npz` instead of a `.npy`.
 
     returns:
-    None
+    output_file_path (str or None): Path of the saved `.npy` (or `.npz`) file, or None if processing failed.
 
     This function processes a single audio file and saves the extracted features to the output folder.
     It creates the necessary directory structure in the output folder to mirror the input folder structure.
     If the input file is not a valid audio file or if an error occurs during processing,
     it will print an error message but continue processing other files.
+    Stage timings, bytes read and written and failures are recorded in `features.instrumentation.METRICS`.
     """
     try:
         # Create the equivalent output path
@@ -34,74 +39,113 @@ def process_file(input_file_path, input_folder, output_folder, mode="melspectrog
         output_dir = os.path.join(output_folder, relative_path)
         os.makedirs(output_dir, exist_ok=True)
 
-        # Generate Mel spectrogram and save
-        if mode == "melspectrogram":
-            spec = melspectrogram(input_file_path)
-        elif mode == "gammatonegram":
-            spec = gammatonegram(input_file_path)
-        elif mode == "mfcc":
-            spec = extract_mfcc_1d(input_file_path)
-        elif mode == "stft":
-            spec = stft_features(input_file_path)
-        elif mode == "wst":
-            spec = wst_features(input_file_path)
-        elif mode == "cqt":
-            spec = cqt_features(input_file_path)
-        else:
+        # Extract the features of the requested mode and save them
+        # Only the requested mode's extractor (and its backend) is imported
+        if mode not in FEATURE_EXTRACTORS:
             raise ValueError(f"Unsupported mode: {mode}")
+        with METRICS.stage("transform"):
+            spec = FEATURE_EXTRACTORS[mode](input_file_path)
+        if spec is None:
+            raise RuntimeError(f"{mode} extractor returned no output")
 
-        if spec is not None:
-            output_file_path = os.path.join(output_dir, os.path.basename(input_file_path).replace('.wav', '.npy'))
-            np.save(output_file_path, spec)
-            print(f"Saved Mel spectrogram: {output_file_path}")
+        output_file_path = os.path.join(output_dir, os.path.basename(input_file_path).replace(
+            '.wav', feature_extension(encoding, compress)))
+        with METRICS.stage("write"):
+            save_features(output_file_path, spec, encoding, compress)
+        METRICS.count("bytes_written", os.path.getsize(output_file_path))
+        METRICS.count("outputs")
+        print(f"Saved {mode}: {output_file_path}")
+        return output_file_path
     except Exception as e:
+        METRICS.failure(e)
         print(f"Failed to process {input_file_path}: {e}")
+    return None
 
-def process_dataset_parallel(input_folder, output_folder, max_workers=8):
+def process_dataset_parallel(input_folder, output_folder, max_workers=None, modes=("melspectrogram",), chunksize=8,
+                             incremental=True, metrics_path=None, report_every=30.0, encoding=None, compress=False):
     """
     parameters:
     input_folder (str): Root folder containing the input audio files.
     output_folder (str): Root folder where the output files will be saved.
-    max_workers (int): Maximum number of threads to use for parallel processing.
+    max_workers (int, optional): Number of worker processes. Defaults to `os.cpu_count()`.
+    modes (list): Feature modes to compute for every file. Defaults to ("melspectrogram",).
+    chunksize (int): Maximum number of files handed to a worker per task.
+    incremental (bool): If True, outputs that are current according to `output_folder/manifest.jsonl`
+        are skipped, so a re-run only processes new or changed files and an interrupted run resumes.
+    metrics_path (str, optional): JSON-lines file for the progress and summary reports.
+    report_every (float): Seconds between two progress reports.
+    encoding (str, optional): Output encoding, see `process_file`.
+    compress (bool): Save deflate-compressed `.npz` files.
 
     returns:
-    None
+    results (list): Per-file results as returned by `preprocessing.engine.extract_dataset`.
 
-    This function processes all audio files in the input folder in parallel using multiple threads.
+    This function processes all audio files in the input folder in parallel using a pool of worker processes.
     It searches for all `.wav` files in the input folder and its subdirectories,
-    processes each file to extract features, and saves the results in the output folder.
-    The output folder structure mirrors the input folder structure.
-    If an error occurs while processing a file, it will print an error message but continue processing
-    other files.
+    decodes each file once, extracts every requested feature mode from it, and saves the results in the output folder.
+    Processing starts while the folder is still being listed, and the longest files are scheduled first.
+    The output folder structure mirrors the input folder structure; with several modes each mode
+    is written under its own `output_folder/<mode>` subfolder.
+    If an error occurs while processing a file, it is recorded in that file's result and processing continues
+    with the other files.
     """
-    wav_files = []
-    for root, _, files in os.walk(input_folder):
-        for file_name in files:
-            if file_name.endswith('.wav'):
-                wav_files.append(os.path.join(root, file_name))
+    return extract_dataset(input_folder, output_folder, modes=modes, max_workers=max_workers, chunksize=chunksize,
+                           incremental=incremental, metrics_path=metrics_path, report_every=report_every,
+                           encoding=encoding, compress=compress)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(process_file, f, input_folder, output_folder) for f in wav_files]
-        for _ in as_completed(futures):
-            pass  # Results are printed inside process_file
-
-def process_dataset_sequential(input_folder, output_folder):
+def process_dataset_sequential(input_folder, output_folder, mode="melspectrogram", incremental=True,
+                               metrics_path=None, report_every=30.0, encoding=None, compress=False):
     """
     parameters:
     input_folder (str): Root folder containing the input audio files.
     output_folder (str): Root folder where the output files will be saved.
+    mode (str): The type of feature extraction to perform, see `process_file`.
+    incremental (bool): If True, outputs that are current according to `output_folder/manifest.jsonl`
+        are skipped and every new output is recorded there, so a re-run only processes new or
+        changed files and an interrupted run resumes where it stopped.
+    metrics_path (str, optional): JSON-lines file for the progress and summary reports.
+    report_every (float): Seconds between two progress reports.
+    encoding (str, optional): Output encoding, see `process_file`.
+    compress (bool): Save deflate-compressed `.npz` files.
 
     returns:
     None
 
     This function processes all audio files in the input folder sequentially.
     It creates the necessary directory structure in the output folder to mirror the input folder structure.
+    Throughput, ETA and the per-stage metrics are reported as in `extract_dataset`.
     """
-    wav_files = []
-    for root, _, files in os.walk(input_folder):
-        for file_name in files:
-            if file_name.endswith('.wav'):
-                wav_files.append(os.path.join(root, file_name))
+    wav_files = find_wav_files(input_folder)
+    hooks = [log_report]
+    if metrics_path is not None:
+        hooks.append(JsonLinesSink(metrics_path))
+    reporter = ProgressReporter(len(wav_files), hooks=hooks, report_every=report_every)
+    METRICS.reset()
+    try:
+        if not incremental:
+            for wav_file in wav_files:
+                process_file(wav_file, input_folder, output_folder, mode, encoding, compress)
+                reporter.update(1, METRICS.snapshot(reset=True))
+            return
 
-    for wav_file in wav_files:
-        process_file(wav_file, input_folder, output_folder)
\ No newline at end of file
+        check_modes([mode])
+        output_options = {"format": "npy", "dtype": None}
+        if encoding is not None or compress:
+            output_options.update(encoding=encoding, compress=compress)
+        mode_fingerprint = fingerprint(mode, FEATURE_EXTRACTORS[mode], **output_options)
+        with Manifest(os.path.join(output_folder, MANIFEST_FILE)) as manifest:
+            for wav_file in wav_files:
+                input_key = os.path.relpath(wav_file, input_folder)
+                expected_path = output_path(wav_file, input_folder, output_folder, mode,
+                                            extension=feature_extension(encoding, compress))
+                signature = file_signature(wav_file)
+                if manifest.is_current(input_key, mode, wav_file, signature, mode_fingerprint, expected_path):
+                    METRICS.count("files_skipped")
+                    reporter.update(1, METRICS.snapshot(reset=True))
+                    continue
+                output_file_path = process_file(wav_file, input_folder, output_folder, mode, encoding, compress)
+                if output_file_path is not None:
+                    manifest.add(input_key, mode, signature, mode_fingerprint, expected_path, output_file_path)
+                reporter.update(1, METRICS.snapshot(reset=True))
+    finally:
+        reporter.close()
@@ -0,0 +1,118 @@
+import json
+import time
+import logging
+from features.instrumentation import Metrics
+
+logger = logging.getLogger("preprocessing")
+
+class JsonLinesSink:
+    """Appends every report to a JSON-lines metrics file, one object per line."""
+    def __init__(self, path):
+        self._file = open(path, "a")
+
+    def __call__(self, report):
+        self._file.write(json.dumps(report) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+def log_report(report):
+    """Default hook: one INFO line on the "preprocessing" logger, with the full report in `extra`."""
+    eta = f"{report['eta_s']:.0f}s" if report["eta_s"] is not None else "?"
+    logger.info("%s: %d/%d files, %.1f files/s, ETA %s, %d failures",
+                report["event"], report["files_done"], report["files_total"], report["files_per_sec"],
+                eta, sum(report["failures"].values()), extra={"metrics": report})
+    if report["event"] == "summary" and report.get("workers"):
+        for pid, worker in sorted(report["workers"].items()):
+            logger.info("worker %s: %d files, %.0f%% of %.1fs busy, %.1fs start-up, %.1fs waiting on reads, %.1fs on writes",
+                        pid, worker["files"], 100 * worker["utilization"], worker.get("lifetime_s", 0.0),
+                        worker.get("startup_s", 0.0),
+                        worker["read_wait_s"], worker["write_wait_s"])
+
+class ProgressReporter:
+    """
+    Aggregates the `features.instrumentation.Metrics` of a run and hands periodic reports to
+    hooks.
+
+    parameters:
+    files_total (int): Number of files the run will process.
+    hooks (list): Callables receiving each report dict, e.g. `log_report` or a `JsonLinesSink`.
+    report_every (float): Minimum seconds between two "progress" reports.
+
+    A report is a flat, JSON-serialisable dict: "event" ("progress" or "summary"), "time",
+    "elapsed_s", "files_done", "files_total", "files_per_sec", "eta_s", the counters (e.g.
+    "bytes_read", "bytes_written", "outputs"), "failures" by exception type and "stages" with the
+    seconds, calls and mean milliseconds per call of each stage, summed over all workers, and,
+    when the updates carry worker statistics, "workers": per worker process the tasks and files
+    it handled, its start-up, busy and read/write wait seconds, its lifetime and its utilization
+    (busy share of the lifetime).
+    """
+    def __init__(self, files_total, hooks=(log_report,), report_every=30.0):
+        self.files_total = files_total
+        self.hooks = list(hooks)
+        self.report_every = report_every
+        self.metrics = Metrics()
+        self.workers = {}
+        self.files_done = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    def update(self, files_done, snapshot=None, worker=None):
+        """
+        Records `files_done` more files, a metrics `snapshot` and the statistics of the `worker`
+        that processed them (a dict with "pid", "lifetime_s", the seconds the worker has been up
+        for, and counters to add up, e.g. "busy_s"); reports if `report_every` has passed.
+        """
+        self.files_done += files_done
+        if snapshot is not None:
+            self.metrics.merge(snapshot)
+        if worker is not None:
+            totals = self.workers.setdefault(str(worker["pid"]), {})
+            for name, value in worker.items():
+                if name == "lifetime_s":
+                    totals[name] = max(totals.get(name, 0.0), value)
+                elif name != "pid":
+                    totals[name] = totals.get(name, 0) + value
+        now = time.perf_counter()
+        if now - self._last_report >= self.report_every:
+            self._last_report = now
+            self.emit("progress")
+
+    def report(self, event="progress"):
+        elapsed = time.perf_counter() - self.start
+        rate = self.files_done / elapsed if elapsed > 0 else 0.0
+        remaining = self.files_total - self.files_done
+        snapshot = self.metrics.snapshot()
+        report = {
+            "event": event,
+            "time": time.time(),
+            "elapsed_s": elapsed,
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "files_per_sec": rate,
+            "eta_s": remaining / rate if rate > 0 else None,
+        }
+        report.update(snapshot["counters"])
+        report["failures"] = snapshot["failures"]
+        report["stages"] = {name: dict(stage, mean_ms=1e3 * stage["seconds"] / stage["calls"])
+                            for name, stage in snapshot["stages"].items() if stage["calls"]}
+        if self.workers:
+            report["workers"] = {pid: dict(worker, utilization=worker.get("busy_s", 0.0) / worker["lifetime_s"]
+                                           if worker.get("lifetime_s", 0.0) > 0 else 0.0)
+                                 for pid, worker in self.workers.items()}
+        return report
+
+    def emit(self, event="progress"):
+        report = self.report(event)
+        for hook in self.hooks:
+            hook(report)
+        return report
+
+    def close(self):
+        """Emits the final "summary" report and closes the hooks that have a `close` method."""
+        report = self.emit("summary")
+        for hook in self.hooks:
+            if hasattr(hook, "close"):
+                hook.close()
+        return report
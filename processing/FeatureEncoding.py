@@ -0,0 +1,105 @@
+import os
+import zipfile
+import numpy as np
+
+# Encodings of a saved feature array. None keeps the dtype the extractor returned (the plain
+# `.npy` output); "float32" halves float64 outputs and "float16" halves float32 ones;
+# "uint8" and "uint16" quantise the values linearly between the array's minimum and maximum and
+# store the scale and offset next to them. For dB outputs, with their ~80 dB range, that is a step
+# of ~0.31 dB (uint8) or ~0.0012 dB (uint16).
+ENCODINGS = (None, "float32", "float16", "uint8", "uint16")
+
+def feature_extension(encoding=None, compress=False):
+    """File extension of a feature saved with this encoding: `.npy`, or `.npz` when quantised or compressed."""
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    return ".npz" if compress or encoding in ("uint8", "uint16") else ".npy"
+
+def encode(array, encoding=None):
+    """
+    parameters:
+    array (np.ndarray): Feature array.
+    encoding (str or None): One of `ENCODINGS`.
+
+    returns:
+    arrays (dict): "data", plus "scale" and "offset" (float64 scalars) for the quantised encodings,
+    such that `data * scale + offset` gives back the values.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    if encoding in (None, "float32", "float16"):
+        return {"data": np.asarray(array, dtype=encoding)}
+    array = np.asarray(array, dtype=np.float64)
+    levels = np.iinfo(encoding).max
+    offset = float(array.min()) if array.size else 0.0
+    span = float(array.max()) - offset if array.size else 0.0
+    scale = span / levels if span > 0 else 1.0
+    data = np.rint((array - offset) / scale).astype(encoding)
+    return {"data": data, "scale": np.float64(scale), "offset": np.float64(offset)}
+
+def decode(arrays):
+    """Inverse of `encode`: the feature as a float32 array (float16 data is left as float16)."""
+    data = arrays["data"]
+    if "scale" not in arrays:
+        return data
+    scale, offset = float(arrays["scale"]), float(arrays["offset"])
+    return (data.astype(np.float32) * np.float32(scale) + np.float32(offset)).astype(np.float32, copy=False)
+
+def save_features(path, array, encoding=None, compress=False):
+    """
+    parameters:
+    path (str): Output path; its extension must be `feature_extension(encoding, compress)`.
+    array (np.ndarray): Feature array.
+    encoding (str or None): One of `ENCODINGS`.
+    compress (bool): Store the arrays in a deflate-compressed `.npz` (fast zlib level 1).
+
+    returns:
+    path (str): The path that was written.
+
+    The uncompressed float encodings are written with `np.save` as before. Everything else is an
+    `.npz` archive that `np.load` can open, with the arrays of `encode`. A feature saved earlier
+    under the other extension (by a run with another encoding) is removed, so each clip keeps one file.
+    """
+    arrays = encode(array, encoding)
+    extension = feature_extension(encoding, compress)
+    stale = path[:-len(extension)] + (".npz" if extension == ".npy" else ".npy")
+    if extension == ".npy":
+        np.save(path, arrays["data"])
+    else:
+        compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        # np.savez_compressed always uses zlib's default level; level 1 is several times faster to
+        # write and reads back at the same speed.
+        with zipfile.ZipFile(path, "w", compression=compression, compresslevel=1 if compress else None) as archive:
+            for name, value in arrays.items():
+                with archive.open(name + ".npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array(member, np.asanyarray(value), allow_pickle=False)
+    if os.path.exists(stale):
+        os.remove(stale)
+    return path
+def load_features(path):
+    """
+    parameters:
+    path (str): A `.npy` or `.npz` feature file written by `save_features` (or plain `np.save`).
+
+    returns:
+    np.ndarray: The decoded feature, float32 for quantised files and as stored otherwise.
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as archive:
+            return decode({name: archive[name] for name in archive.files})
+    return np.load(path)
+
+def feature_shape(path):
+    """Shape of a saved feature, read from the file header without loading or decompressing the data."""
+    if not path.endswith(".npz"):
+        return np.load(path, mmap_mode="r").shape
+    with zipfile.ZipFile(path) as archive, archive.open("data.npy") as member:
+        version = np.lib.format.read_magic(member)
+        if version == (1, 0):
+            shape, _, _ = np.lib.format.read_array_header_1_0(member)
+        else:
+            shape, _, _ = np.lib.format.read_array_header_2_0(member)
+    return shape
+
+def is_feature_file(file_name):
+    return file_name.endswith(".npy") or file_name.endswith(".npz")
@@ -0,0 +1,166 @@
+import os
+import json
+import numpy as np
+
+INDEX_FILE = "index.npz"
+META_FILE = "meta.json"
+
+class FeatureStoreWriter:
+    """
+    Appends feature arrays to raw, contiguous shard files of one dtype.
+
+    Every `add` returns an index entry (key, shard, offset, shape); the entries of all writers
+    feeding one store are combined into the store index with `write_index`. Several writers,
+    e.g. one per worker process, can write into the same folder as long as their `prefix`
+    differs. `close` may be called between batches of work; the next `add` reopens the current
+    shard in append mode.
+    The default float32 keeps the features exact; "float16" halves the shards at the cost of
+    ~3 significant digits.
+    """
+    def __init__(self, store_dir, dtype="float32", shard_bytes=1 << 30, prefix="shard"):
+        self.store_dir = store_dir
+        self.dtype = np.dtype(dtype)
+        self.shard_bytes = shard_bytes
+        self.prefix = prefix
+        self.shard_index = 0
+        self._file = None
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _shard_name(self):
+        return f"{self.prefix}-{self.shard_index:05d}.bin"
+
+    def add(self, key, array):
+        """
+        parameters:
+        key (str): Identifier of the clip, usually the path of the input audio file.
+        array (np.ndarray): Feature array of any shape.
+
+        returns:
+        entry (dict): Index entry with keys "key", "shard", "offset" (in elements) and "shape".
+        """
+        data = np.ascontiguousarray(array, dtype=self.dtype)
+        if self._file is None:
+            self._file = open(os.path.join(self.store_dir, self._shard_name()), "ab")
+        position = self._file.tell()
+        if position > 0 and position + data.nbytes > self.shard_bytes:
+            self._file.close()
+            self.shard_index += 1
+            self._file = open(os.path.join(self.store_dir, self._shard_name()), "ab")
+            position = self._file.tell()
+        self._file.write(data.tobytes())
+        return {"key": key, "shard": self._shard_name(), "offset": position // self.dtype.itemsize,
+                "shape": tuple(data.shape)}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_index(store_dir, entries, labels, classes, dtype):
+    """
+    parameters:
+    store_dir (str): Folder of the feature store.
+    entries (list): Index entries returned by `FeatureStoreWriter.add`.
+    labels (list): Integer class label of each entry.
+    classes (list): Class names, indexed by label.
+    dtype (str or np.dtype): Dtype the shards were written with.
+
+    returns:
+    None
+
+    Writes the store index: a `meta.json` with the dtype, class names and shard files, and an
+    `index.npz` with one row per clip (key, label, shard id, offset, shape).
+    """
+    shards = sorted({entry["shard"] for entry in entries})
+    shard_ids = {name: i for i, name in enumerate(shards)}
+    max_ndim = max((len(entry["shape"]) for entry in entries), default=1)
+    shapes = np.ones((len(entries), max_ndim), dtype=np.int64)
+    ndims = np.empty(len(entries), dtype=np.int8)
+    for i, entry in enumerate(entries):
+        ndims[i] = len(entry["shape"])
+        shapes[i, :ndims[i]] = entry["shape"]
+    np.savez(
+        os.path.join(store_dir, INDEX_FILE),
+        keys=np.array([entry["key"] for entry in entries], dtype=str),
+        labels=np.asarray(labels, dtype=np.int64),
+        shards=np.array([shard_ids[entry["shard"]] for entry in entries], dtype=np.int32),
+        offsets=np.array([entry["offset"] for entry in entries], dtype=np.int64),
+        shapes=shapes,
+        ndims=ndims,
+    )
+    with open(os.path.join(store_dir, META_FILE), "w") as f:
+        json.dump({"dtype": np.dtype(dtype).str, "classes": list(classes), "shards": shards}, f)
+
+def remove_unreferenced_shards(store_dir, entries):
+    """
+    parameters:
+    store_dir (str): Folder of the feature store.
+    entries (list): Index entries of the store, as given to `write_index`.
+
+    returns:
+    removed (list): Names of the deleted shard files.
+
+    Deletes the `.bin` shards of `store_dir` that no entry points to, e.g. those of earlier runs
+    whose outputs were all rewritten. Space held by superseded clips inside a shard that is
+    still referenced is only reclaimed when the whole shard is.
+    """
+    referenced = {entry["shard"] for entry in entries}
+    removed = []
+    for name in sorted(os.listdir(store_dir)):
+        if name.endswith(".bin") and name not in referenced:
+            os.remove(os.path.join(store_dir, name))
+            removed.append(name)
+    return removed
+
+class FeatureStore:
+    """
+    Read side of a feature store. Shards are opened with `np.memmap` on first use and
+    `store[i]` returns a zero-copy view of clip `i` with its original shape.
+    """
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, META_FILE)) as f:
+            meta = json.load(f)
+        self.dtype = np.dtype(meta["dtype"])
+        self.classes = meta["classes"]
+        self.shard_names = meta["shards"]
+        with np.load(os.path.join(store_dir, INDEX_FILE)) as index:
+            self.keys = index["keys"]
+            self.labels = index["labels"]
+            self.shards = index["shards"]
+            self.offsets = index["offsets"]
+            self.shapes = index["shapes"]
+            self.ndims = index["ndims"]
+        self._memmaps = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _shard(self, shard_id):
+        shard = self._memmaps.get(shard_id)
+        if shard is None:
+            # Copy-on-write keeps the views writable (torch.from_numpy rejects read-only arrays)
+            # without ever touching the file.
+            shard = np.memmap(os.path.join(self.store_dir, self.shard_names[shard_id]), dtype=self.dtype, mode="c")
+            self._memmaps[shard_id] = shard
+        return shard
+
+    def shape(self, idx):
+        return tuple(int(n) for n in self.shapes[idx, :self.ndims[idx]])
+
+    def __getitem__(self, idx):
+        shape = self.shape(idx)
+        offset = int(self.offsets[idx])
+        return self._shard(int(self.shards[idx]))[offset:offset + int(np.prod(shape))].reshape(shape)
+
+    def __getstate__(self):
+        # Memmaps are reopened lazily in each DataLoader worker instead of being pickled.
+        state = self.__dict__.copy()
+        state["_memmaps"] = {}
+        return state
@@ -0,0 +1,38 @@
+from torch.utils.data import Dataset
+import numpy as np
+import torch
+from processing.FeatureStore import FeatureStore
+
+class FeatureStoreDataset(Dataset):
+    """
+    Dataset over a sharded feature store written by `preprocessing.engine.extract_dataset`
+    with `output_format="store"`. Returns the same (1, ...) float32 tensors and long labels as
+    `MelSpectrogramDataset`, but reads from memory-mapped shards instead of one `.npy` per clip.
+    A slice or a sequence of indices, as yielded by `processing.SliceBatchSampler`, returns a
+    stacked (B, 1, ...) batch with its labels.
+    """
+    def __init__(self, store_dir):
+        self.store = FeatureStore(store_dir)
+        self.classes = self.store.classes
+        self.labels = self.store.labels.tolist()
+        self.label_tensor = torch.from_numpy(self.store.labels)
+
+    def lengths(self):
+        """Length of the last (time) axis of every feature, e.g. for `processing.LengthBucketSampler`."""
+        return [self.store.shape(i)[-1] for i in range(len(self))]
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            idx = range(*idx.indices(len(self)))
+        if isinstance(idx, (range, list, tuple, np.ndarray, torch.Tensor)):
+            indices = torch.as_tensor(idx, dtype=torch.long)
+            return torch.stack([self[int(i)][0] for i in indices]), self.label_tensor[indices]
+        # Zero-copy for float32 stores; float16 stores are widened to float32 here.
+        spec = torch.from_numpy(self.store[idx]).float()
+        spec = spec.unsqueeze(0)
+        label = torch.tensor(self.labels[idx], dtype=torch.long)
+
+        return spec, label
@@ -0,0 +1,68 @@
+import torch
+from torch.utils.data import Sampler
+
+class LengthBucketSampler(Sampler):
+    """
+    Batches clips of similar length together, so `processing.PadCollate` only pads each batch to
+    its own longest clip instead of the longest clip of the dataset.
+
+    parameters:
+    lengths (sequence): Length of every sample, e.g. `MelSpectrogramDataset.lengths()`.
+    batch_size (int): Number of samples per batch.
+    batches_per_bucket (int): The samples, sorted by length, are cut into buckets of
+        `batches_per_bucket * batch_size` neighbours and every batch is drawn from one bucket.
+        Larger buckets mix the batches more, smaller ones pad less.
+    shuffle (bool): If True, ties in length are broken randomly, the samples are shuffled within
+        their bucket and the batches are yielded in random order, anew every epoch. If False,
+        batches are yielded from the shortest to the longest clips.
+    drop_last (bool): Drop the one batch smaller than `batch_size`, if any.
+    generator (torch.Generator, optional): Random generator used for shuffling.
+
+    Use it as the `batch_sampler` of a DataLoader, with `PadCollate` as `collate_fn`:
+
+        DataLoader(dataset, batch_sampler=LengthBucketSampler(dataset.lengths(), 32, shuffle=True),
+                   collate_fn=PadCollate())
+    """
+    def __init__(self, lengths, batch_size, batches_per_bucket=8, shuffle=False, drop_last=False, generator=None):
+        self.lengths = torch.as_tensor(lengths, dtype=torch.long)
+        self.batch_size = batch_size
+        self.bucket_size = batches_per_bucket * batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    def __iter__(self):
+        n_samples = len(self.lengths)
+        if self.shuffle:
+            # Sorting a random permutation by length breaks ties randomly.
+            order = torch.randperm(n_samples, generator=self.generator)
+            order = order[torch.argsort(self.lengths[order], stable=True)]
+        else:
+            order = torch.argsort(self.lengths, stable=True)
+
+        batches = []
+        for start in range(0, n_samples, self.bucket_size):
+            bucket = order[start:start + self.bucket_size]
+            if self.shuffle:
+                bucket = bucket[torch.randperm(len(bucket), generator=self.generator)]
+            batches.extend(bucket.split(self.batch_size))
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches), generator=self.generator).tolist()]
+        for batch in batches:
+            yield batch.tolist()
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.lengths) // self.batch_size
+        return -(-len(self.lengths) // self.batch_size)
+
+    def padding_ratio(self):
+        """Fraction of the batched elements along the length axis that is padding over one epoch (shuffled if `shuffle`)."""
+        total = padded = 0
+        for batch in self:
+            lengths = self.lengths[batch]
+            total += len(batch) * int(lengths.max())
+            padded += len(batch) * int(lengths.max()) - int(lengths.sum())
+        return padded / total if total else 0.0
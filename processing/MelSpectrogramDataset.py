@@ -2,11 +2,37 @@ from torch.utils.data import Dataset
 import os
 import numpy as np
 import torch
+from processing.FeatureEncoding import feature_shape, is_feature_file, load_features
 
 class MelSpectrogramDataset(Dataset):
-    def __init__(self, data_dir):
+    """
+    Dataset over the `.npy`/`.npz` feature files written by preprocessing, one sub-folder per class.
+    float16 and quantised files (see `processing.FeatureEncoding`) are decoded to float32 on load.
+
+    parameters:
+    data_dir (str): Folder with one sub-folder of `.npy` or `.npz` files per class. A clip saved
+        as both `.npy` and `.npz` is ambiguous and raises a ValueError (preprocessing removes the
+        file of the previous encoding when it writes another one).
+    cache (bool): If True, every feature is decoded once and kept in a single preallocated float32
+        tensor, so later epochs only slice it. The tensor is filled as items are first read, or at
+        once with `fill_cache`. Use `num_workers=0` in cached mode: each DataLoader worker would
+        otherwise fill its own copy.
+    max_cache_bytes (int): Largest cache tensor to allocate. Beyond it the files are read on
+        every access and the OS page cache keeps the recently used ones in RAM; for datasets
+        far over the cap, a feature store (`processing.FeatureStoreDataset`) reads from a few
+        large shards instead.
+    pin_memory (bool): Allocate the cache tensor in pinned memory for faster, asynchronous copies
+        to the GPU. Ignored when CUDA is not available.
+
+    Besides integer indices, `dataset[batch]` accepts a slice or a sequence of indices, as yielded
+    by `processing.SliceBatchSampler`, and returns a whole (B, 1, ...) batch with its labels.
+    Batches need all features to have the same shape; for clips of different lengths use
+    `processing.LengthBucketSampler` and `processing.PadCollate` with `lengths()`.
+    """
+    def __init__(self, data_dir, cache=False, max_cache_bytes=2 << 30, pin_memory=False):
         self.data_dir = data_dir
-        self.classes = sorted(os.listdir(data_dir))  # Get class names
+        # Get class names; plain files such as the preprocessing manifest are not classes
+        self.classes = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
         self.file_paths = []
         self.labels = []
 
@@ -17,23 +43,110 @@ class MelSpectrogramDataset(Dataset):
             if class_name == ".ipynb_checkpoints":
                 continue
 
+            stems = {}
             for file in os.listdir(class_path):
                 file_path = os.path.join(class_path, file)
 
-                # Check if it's a valid `.npy` file
-                if file.endswith(".npy"):
+                # Check if it's a valid `.npy`/`.npz` feature file
+                if is_feature_file(file):
+                    stem = os.path.splitext(file)[0]
+                    if stem in stems:
+                        raise ValueError(f"Both {stems[stem]} and {file_path} exist; remove the stale encoding")
+                    stems[stem] = file_path
                     self.file_paths.append(file_path)
                     self.labels.append(class_idx)
 
+        self.label_tensor = torch.tensor(self.labels, dtype=torch.long)
+        self.cache = cache
+        self._cache = None
+        self.sample_shape = None
+        self._shapes = None
+        if cache:
+            self._init_cache(max_cache_bytes, pin_memory)
+
+    def shapes(self):
+        """Shape of every feature, read from the file headers without loading the data."""
+        if self._shapes is None:
+            self._shapes = [feature_shape(path) for path in self.file_paths]
+        return self._shapes
+
+    def lengths(self):
+        """Length of the last (time) axis of every feature, e.g. for `processing.LengthBucketSampler`."""
+        return [shape[-1] if shape else 1 for shape in self.shapes()]
+
+    def _init_cache(self, max_cache_bytes, pin_memory):
+        # Only the file headers are read here; the data is read on first access.
+        shapes = self.shapes()
+        if shapes and all(shape == shapes[0] for shape in shapes):
+            self.sample_shape = shapes[0]
+        sizes = np.array([int(np.prod(shape)) for shape in shapes], dtype=np.int64)
+        self._offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        total_bytes = int(self._offsets[-1]) * 4
+        if total_bytes > max_cache_bytes:
+            return
+        pin_memory = pin_memory and torch.cuda.is_available()
+        self._cache = torch.empty(int(self._offsets[-1]), dtype=torch.float32, pin_memory=pin_memory)
+        self._filled = np.zeros(len(self.file_paths), dtype=bool)
+
+    def _load(self, idx):
+        # Opened per access: keeping a mapping per file would run into the kernel's limit on
+        # memory mappings (vm.max_map_count) for datasets of tens of thousands of files.
+        return torch.from_numpy(load_features(self.file_paths[idx])).float()
+
+    def _cached(self, idx):
+        view = self._cache[int(self._offsets[idx]):int(self._offsets[idx + 1])].view(self._shapes[idx])
+        if not self._filled[idx]:
+            view.copy_(self._load(idx))
+            self._filled[idx] = True
+        return view
+
+    def fill_cache(self):
+        """Reads every feature into the cache tensor now instead of during the first epoch."""
+        if self._cache is not None:
+            for idx in np.flatnonzero(~self._filled):
+                self._cached(idx)
+
+    def as_tensor(self):
+        """
+        returns:
+        samples (torch.Tensor): (N, 1, ...) view of the whole filled cache, in dataset order.
+
+        Needs `cache=True`, a cache within `max_cache_bytes` and features of one shape.
+        """
+        if self._cache is None or self.sample_shape is None:
+            raise ValueError("as_tensor needs cache=True, a cache within max_cache_bytes and features of one shape")
+        self.fill_cache()
+        return self._cache.view(len(self), 1, *self.sample_shape)
+
     def __len__(self):
         return len(self.file_paths)
 
     def __getitem__(self, idx):
-        file_path = self.file_paths[idx]
-        mel_spec = np.load(file_path)
+        if isinstance(idx, (slice, list, tuple, np.ndarray, torch.Tensor)):
+            return self._batch(idx)
+        if self._cache is not None:
+            mel_spec = self._cached(idx)
+        else:
+            mel_spec = self._load(idx)
+        mel_spec = mel_spec.unsqueeze(0)  # Shape: (1, ...)
+        label = self.label_tensor[idx]
+
+        return mel_spec, label
 
-        mel_spec = torch.tensor(mel_spec, dtype=torch.float32)
-        mel_spec = mel_spec.unsqueeze(0)  # Shape: (1, 193)# Convert to Tensor
-        label = torch.tensor(self.labels[idx], dtype=torch.long)
+    def _batch(self, indices):
+        if isinstance(indices, slice):
+            indices = range(*indices.indices(len(self)))
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        labels = self.label_tensor[indices]
+        if self._cache is None or self.sample_shape is None:
+            return torch.stack([self[int(i)][0] for i in indices]), labels
 
-        return mel_spec, label
\ No newline at end of file
+        if not self._filled[indices.numpy()].all():
+            for i in indices.tolist():
+                self._cached(i)
+        samples = self._cache.view(len(self), 1, *self.sample_shape)
+        start = int(indices[0]) if len(indices) else 0
+        if torch.equal(indices, torch.arange(start, start + len(indices))):
+            # A contiguous range is a zero-copy view of the cache.
+            return samples[start:start + len(indices)], labels
+        return samples.index_select(0, indices), labels
@@ -0,0 +1,95 @@
+from torch.utils.data import Dataset
+import os
+import math
+import soundfile as sf
+import torch
+from features.audio_cache import AudioCache
+from features.torch_features import TorchFeatureExtractor
+
+class OnlineFeatureDataset(Dataset):
+    """
+    Dataset over the raw `.wav` files, one sub-folder per class, that computes the features on the
+    fly with `features.torch_features.TorchFeatureExtractor` instead of reading preprocessed files.
+
+    parameters:
+    data_dir (str): Folder with one sub-folder of `.wav` files per class, as given to `process_dataset_*`.
+    mode (str): "melspectrogram", "stft" or "gammatonegram".
+    return_audio (bool): If False, an item is the (1, F, frames) feature and its label, like
+        `MelSpectrogramDataset`. If True, an item is the (T,) waveform at the extractor's rate and
+        its label; batch them with `PadCollate(pad_value=0.0)` and run `dataset.extractor` on the
+        whole batch (e.g. on the GPU) with the `lengths` the collate returns.
+    audio_cache_bytes (int): In-memory budget of each worker's decoded-audio cache.
+    audio_cache_dir (str, optional): Folder for an on-disk float32 audio cache shared by all
+        workers and runs, see `features.audio_cache.AudioCache`; it makes later epochs skip the
+        decode and resample.
+    **params: Feature parameters overriding the mode's defaults, e.g. `n_mels=64` (see
+        `features.torch_features.TORCH_FEATURE_PARAMS`).
+
+    With the default parameters the features match the `features/` functions (within float32
+    rounding), so a model can be trained on this dataset and evaluated on preprocessed files. A
+    parameter change only needs a new dataset, not another preprocessing pass.
+    The audio cache and the torch ops run in the DataLoader worker processes; the cache is
+    created in each worker on first use.
+    """
+    def __init__(self, data_dir, mode="melspectrogram", return_audio=False, audio_cache_bytes=256 * 1024 ** 2,
+                 audio_cache_dir=None, **params):
+        self.data_dir = data_dir
+        self.classes = sorted(d for d in os.listdir(data_dir)
+                              if os.path.isdir(os.path.join(data_dir, d)) and d != ".ipynb_checkpoints")
+        self.file_paths = []
+        self.labels = []
+        for class_idx, class_name in enumerate(self.classes):
+            class_path = os.path.join(data_dir, class_name)
+            for file in sorted(os.listdir(class_path)):
+                if file.endswith(".wav"):
+                    self.file_paths.append(os.path.join(class_path, file))
+                    self.labels.append(class_idx)
+
+        self.label_tensor = torch.tensor(self.labels, dtype=torch.long)
+        self.extractor = TorchFeatureExtractor(mode, **params)
+        self.return_audio = return_audio
+        self.audio_cache_bytes = audio_cache_bytes
+        self.audio_cache_dir = audio_cache_dir
+        self._audio_cache = None
+
+    def __getstate__(self):
+        # The cache holds a lock and decoded audio; every worker builds its own.
+        state = self.__dict__.copy()
+        state["_audio_cache"] = None
+        return state
+
+    def load_audio(self, idx):
+        """(y, sr) of clip `idx` at the extractor's rate (native for Gammatone), served from the audio cache."""
+        if self._audio_cache is None:
+            self._audio_cache = AudioCache(max_bytes=self.audio_cache_bytes, cache_dir=self.audio_cache_dir)
+        return self._audio_cache.get(self.file_paths[idx], self.extractor.sr)
+
+    def lengths(self):
+        """
+        Number of frames of every clip's feature (of samples with `return_audio`), from the WAV
+        headers, for `processing.LengthBucketSampler`.
+        """
+        hop_length = self.extractor.params["hop_length"]
+        lengths = []
+        for path in self.file_paths:
+            info = sf.info(path)
+            n_samples = info.frames
+            if self.extractor.sr is not None and self.extractor.sr != info.samplerate:
+                # Length of librosa.resample's output.
+                n_samples = math.ceil(n_samples * self.extractor.sr / info.samplerate)
+            lengths.append(n_samples if self.return_audio else 1 + n_samples // hop_length)
+        return lengths
+
+    def __len__(self):
+        return len(self.file_paths)
+
+    def __getitem__(self, idx):
+        y, sr = self.load_audio(idx)
+        y = torch.from_numpy(y)
+        label = self.label_tensor[idx]
+        if self.return_audio:
+            return y, label
+        # no_grad rather than inference_mode: the features are inputs of a later backward pass.
+        with torch.no_grad():
+            features, _ = self.extractor(y, sr=sr)
+        return features, label  # Shape: (1, F, frames)
@@ -0,0 +1,57 @@
+import torch
+
+class PadCollate:
+    """
+    Collate function for features whose last (time) axis differs between clips.
+
+    parameters:
+    crop_length (int, optional): If given, clips longer than this many frames are cut to a window
+        of `crop_length` frames, so every batch is at most that long.
+    random_crop (bool): Take each window at a random offset (training) rather than from the
+        start of the clip (evaluation).
+    pad_value (float, optional): Value the shorter clips are padded with. None pads each clip
+        with its own minimum, i.e. the floor of a dB feature, so padding looks like silence.
+    pad_multiple (int): Round the batch length up to a multiple of this many frames, which keeps
+        the number of distinct input shapes (and cuDNN / torch.compile re-tuning) small.
+    generator (torch.Generator, optional): Random generator used for the crop offsets.
+
+    returns (from a call on a list of (feature, label) items, as returned by `MelSpectrogramDataset`):
+    inputs (torch.Tensor): (B, ..., T) batch, T being the longest (cropped) clip of the batch.
+    labels (torch.Tensor): (B,) labels.
+    lengths (torch.Tensor): (B,) number of real, non-padded frames of every clip.
+
+    `train_model` and `evaluation.engine.evaluate` accept these 3-tuples like (inputs, labels)
+    batches. Pair it with `processing.LengthBucketSampler` so the clips of a batch have similar
+    lengths and little padding.
+    """
+    def __init__(self, crop_length=None, random_crop=True, pad_value=None, pad_multiple=1, generator=None):
+        self.crop_length = crop_length
+        self.random_crop = random_crop
+        self.pad_value = pad_value
+        self.pad_multiple = pad_multiple
+        self.generator = generator
+
+    def _crop(self, feature):
+        length = feature.shape[-1]
+        if self.crop_length is None or length <= self.crop_length:
+            return feature
+        start = 0
+        if self.random_crop:
+            start = int(torch.randint(length - self.crop_length + 1, (), generator=self.generator))
+        return feature[..., start:start + self.crop_length]
+
+    def __call__(self, batch):
+        features = [self._crop(torch.as_tensor(feature)) for feature, _ in batch]
+        labels = torch.stack([torch.as_tensor(label) for _, label in batch])
+        lengths = torch.tensor([feature.shape[-1] for feature in features], dtype=torch.long)
+
+        max_length = int(lengths.max()) if len(features) else 0
+        max_length = -(-max_length // self.pad_multiple) * self.pad_multiple
+        inputs = torch.empty((len(features), *features[0].shape[:-1], max_length), dtype=features[0].dtype) \
+            if features else torch.empty(0)
+        for i, feature in enumerate(features):
+            length = feature.shape[-1]
+            inputs[i, ..., :length] = feature
+            if length < max_length:
+                inputs[i, ..., length:] = feature.min() if self.pad_value is None else self.pad_value
+        return inputs, labels, lengths
@@ -0,0 +1,40 @@
+import torch
+from torch.utils.data import Sampler
+
+class SliceBatchSampler(Sampler):
+    """
+    Yields whole batches of indices for datasets that can index a batch at once, such as
+    `MelSpectrogramDataset` and `FeatureStoreDataset`, instead of collating single items.
+
+    parameters:
+    n_samples (int): Number of samples in the dataset.
+    batch_size (int): Number of samples per batch.
+    shuffle (bool): If False, every batch is a `slice`, which a cached `MelSpectrogramDataset`
+        answers with a zero-copy view. If True, every batch is a LongTensor of indices drawn from a
+        new permutation each epoch.
+    drop_last (bool): Drop the last batch if it is smaller than `batch_size`.
+    generator (torch.Generator, optional): Random generator used for shuffling.
+
+    Use it as the `sampler` of a DataLoader with `batch_size=None`, so the batch returned by
+    the dataset is passed through as it is:
+
+        DataLoader(dataset, sampler=SliceBatchSampler(len(dataset), 32, shuffle=True), batch_size=None)
+    """
+    def __init__(self, n_samples, batch_size, shuffle=False, drop_last=False, generator=None):
+        self.n_samples = n_samples
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    def __iter__(self):
+        if self.shuffle:
+            order = torch.randperm(self.n_samples, generator=self.generator)
+        for start in range(0, len(self) * self.batch_size, self.batch_size):
+            stop = min(start + self.batch_size, self.n_samples)
+            yield order[start:stop] if self.shuffle else slice(start, stop)
+
+    def __len__(self):
+        if self.drop_last:
+            return self.n_samples // self.batch_size
+        return -(-self.n_samples // self.batch_size)
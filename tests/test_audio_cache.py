@@ -0,0 +1,20 @@
+import numpy as np
+import soundfile as sf
+import features.audio_cache as audio_cache
+from features.audio_cache import AudioCache
+
+def test_handle_decodes_and_resamples_once_over_the_budget(tmp_path, monkeypatch):
+    path = str(tmp_path / "clip.wav")
+    sf.write(path, 0.1 * np.random.default_rng(0).standard_normal(5 * 44100), 44100)
+    decodes, resamples = [], []
+    load, resample = audio_cache.librosa.load, audio_cache.librosa.resample
+    monkeypatch.setattr(audio_cache.librosa, "load", lambda *a, **k: decodes.append(a) or load(*a, **k))
+    monkeypatch.setattr(audio_cache.librosa, "resample",
+                        lambda y, **k: resamples.append(k["target_sr"]) or resample(y, **k))
+
+    audio = AudioCache(max_bytes=1 << 20).open(path)
+    for sr in (None, 22050, 16000, 22050, None, 16000):
+        y, y_sr = audio.load(sr)
+        assert y_sr == (44100 if sr is None else sr)
+    assert len(decodes) == 1
+    assert resamples == [22050, 16000]
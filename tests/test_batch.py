@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from features.batch import extract_batch
+from preprocessing.engine import FEATURE_EXTRACTORS
+
+# Clips of different lengths, zero-padded to 4096-sample buckets at every mode's rate.
+DURATIONS = (0.9, 0.95, 0.97, 1.0)
+
+MODES = ("melspectrogram", "gammatonegram", "mfcc", "stft", "cqt")
+
+# Frames at the end of a padded clip that may differ from the single-clip result, and by how much.
+# The other modes are exact up to float32 rounding.
+TAIL_TOLERANCES = {
+    "gammatonegram": (2, 0.15),
+}
+
+@pytest.mark.parametrize("mode", MODES)
+def test_bucketed_batch_matches_single_clip(mode):
+    rng = np.random.default_rng(0)
+    sr = 16000
+    clips = [((0.1 * rng.standard_normal(int(sr * d))).astype(np.float32), sr) for d in DURATIONS]
+    tail, tail_atol = TAIL_TOLERANCES.get(mode, (0, 1e-4))
+    for clip, batched in zip(clips, extract_batch(clips, mode, bucket_multiple=4096)):
+        expected = FEATURE_EXTRACTORS[mode](clip)
+        assert batched.shape == expected.shape
+        body = slice(None, expected.shape[-1] - tail)
+        np.testing.assert_allclose(batched[..., body], expected[..., body], rtol=0, atol=1e-4)
+        np.testing.assert_allclose(batched, expected, rtol=0, atol=tail_atol)
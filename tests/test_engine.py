@@ -0,0 +1,23 @@
+import os
+import sys
+import numpy as np
+import pytest
+from preprocessing.engine import FEATURE_EXTRACTORS, check_modes, iter_wav_files
+
+def test_iter_wav_files_yields_sorted_paths(tmp_path):
+    for name in ("z/3.wav", "a/y/2.wav", "b/4.wav", "a/x/1.wav", "0.wav", "a/notes.txt"):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    paths = [os.path.relpath(path, tmp_path) for path, _ in iter_wav_files(str(tmp_path))]
+    assert paths == ["0.wav", "a/x/1.wav", "a/y/2.wav", "b/4.wav", "z/3.wav"]
+
+def test_mode_check_does_not_import_the_backend():
+    sys.modules.pop("features.wst_features", None)
+    FEATURE_EXTRACTORS._extractors.pop("wst", None)
+    assert check_modes(["wst"]) == ("wst",)
+    assert "features.wst_features" not in sys.modules
+
+def test_extractor_errors_reach_the_caller():
+    with pytest.raises(Exception, match="reflect padding"):
+        FEATURE_EXTRACTORS["gammatonegram"]((np.zeros(100, dtype=np.float32), 16000))
@@ -0,0 +1,23 @@
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, TensorDataset
+from evaluation.engine import evaluate
+
+def test_evaluate_counts_the_final_partial_batch():
+    # The model predicts the index of each input's largest value.
+    model = nn.Identity()
+    labels = torch.tensor([0, 0, 0, 1, 1, 1, 1, 2, 2, 2])
+    predictions = torch.tensor([0, 0, 1, 1, 1, 1, 2, 2, 2, 0])
+    inputs = nn.functional.one_hot(predictions, 3).float()
+    loader = DataLoader(TensorDataset(inputs, labels), batch_size=4)
+
+    results = evaluate(model, loader, device="cpu")
+
+    assert torch.equal(results["y_true"], labels)
+    assert torch.equal(results["y_pred"], predictions)
+    assert results["probs"].shape == (10, 3)
+    assert torch.equal(results["confusion"], torch.tensor([[2, 1, 0], [0, 3, 1], [1, 0, 2]]))
+    assert torch.equal(results["support"], torch.tensor([3, 4, 3]))
+    torch.testing.assert_close(results["recall"], torch.tensor([2 / 3, 3 / 4, 2 / 3], dtype=torch.float64))
+    torch.testing.assert_close(results["precision"], torch.tensor([2 / 3, 3 / 4, 2 / 3], dtype=torch.float64))
+    assert results["accuracy"] == 0.7
@@ -0,0 +1,14 @@
+import numpy as np
+from processing.FeatureEncoding import load_features, save_features
+from processing.MelSpectrogramDataset import MelSpectrogramDataset
+
+def test_new_encoding_replaces_the_previous_file(tmp_path):
+    (tmp_path / "dog").mkdir()
+    feature = np.linspace(-80, 0, 64 * 10, dtype=np.float32).reshape(64, 10)
+    save_features(str(tmp_path / "dog" / "1.npy"), feature)
+    save_features(str(tmp_path / "dog" / "1.npz"), feature, encoding="uint16")
+    assert sorted(path.name for path in (tmp_path / "dog").iterdir()) == ["1.npz"]
+    save_features(str(tmp_path / "dog" / "1.npy"), feature, encoding="float16")
+    assert sorted(path.name for path in (tmp_path / "dog").iterdir()) == ["1.npy"]
+    np.testing.assert_allclose(load_features(str(tmp_path / "dog" / "1.npy")), feature, atol=0.05)
+    assert len(MelSpectrogramDataset(str(tmp_path))) == 1
@@ -0,0 +1,15 @@
+import os
+import numpy as np
+from processing.FeatureStore import FeatureStore, FeatureStoreWriter, remove_unreferenced_shards, write_index
+
+def test_float32_by_default_and_stale_shards_removed(tmp_path):
+    store_dir = str(tmp_path)
+    with FeatureStoreWriter(store_dir, prefix="shard-old") as writer:
+        writer.add("a", np.zeros((2, 3)))
+    features = np.random.default_rng(0).standard_normal((2, 3))
+    with FeatureStoreWriter(store_dir, prefix="shard-new") as writer:
+        entries = [writer.add("a", features)]
+    write_index(store_dir, entries, [0], ["class"], writer.dtype)
+    assert remove_unreferenced_shards(store_dir, entries) == ["shard-old-00000.bin"]
+    assert sorted(os.listdir(store_dir)) == ["index.npz", "meta.json", "shard-new-00000.bin"]
+    np.testing.assert_array_equal(FeatureStore(store_dir)[0], features.astype(np.float32))
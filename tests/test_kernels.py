@@ -0,0 +1,14 @@
+import numpy as np
+import librosa
+import pytest
+from features.cqt_features import CQT_PARAMS, CQT_SR
+from features.kernels import cqt
+
+@pytest.mark.parametrize("shape", [(32193,), (7000,), (3, 20000)])
+def test_cqt_matches_librosa(shape):
+    y = (0.1 * np.random.default_rng(0).standard_normal(shape)).astype(np.float32)
+    np.testing.assert_array_equal(cqt(y, sr=CQT_SR, **CQT_PARAMS), librosa.cqt(y, sr=CQT_SR, **CQT_PARAMS))
+
+def test_cqt_default_parameters_match_librosa():
+    y = np.random.default_rng(1).standard_normal(22050)
+    np.testing.assert_array_equal(cqt(y, sr=22050), librosa.cqt(y, sr=22050))
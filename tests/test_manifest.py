@@ -0,0 +1,13 @@
+from preprocessing.manifest import Manifest
+
+SIGNATURE = {"size": 1, "mtime_ns": 2}
+
+def test_resume_after_a_torn_line_keeps_the_next_record(tmp_path):
+    path = str(tmp_path / "manifest.jsonl")
+    with Manifest(path) as manifest:
+        manifest.add("a.wav", "stft", SIGNATURE, "f", "out", "out/a.npy")
+    with open(path, "a") as f:
+        f.write('{"input": "b.wav", "mo')  # crash in the middle of a write
+    with Manifest(path) as manifest:
+        manifest.add("c.wav", "stft", SIGNATURE, "f", "out", "out/c.npy")
+    assert sorted(Manifest(path).records) == [("a.wav", "stft"), ("c.wav", "stft")]
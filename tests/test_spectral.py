@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+import features.spectral as spectral
+from features.mfcc_features import extract_mfcc_1d
+from features.stft_features import stft_features
+
+@pytest.fixture
+def audio():
+    rng = np.random.default_rng(0)
+    return (0.1 * rng.standard_normal(22050)).astype(np.float32), 22050
+
+def test_fast_stft_shares_the_mfcc_spectrogram(audio, monkeypatch):
+    calls = []
+    power_spectrogram = spectral.power_spectrogram
+
+    def counting(y, n_fft, hop_length, **kwargs):
+        calls.append((n_fft, hop_length))
+        return power_spectrogram(y, n_fft, hop_length, **kwargs)
+
+    monkeypatch.setattr(spectral, "power_spectrogram", counting)
+    features = spectral.spectral_features(audio, ["stft", "mfcc"], compat=False)
+    assert calls == [(2048, 512)]
+    assert features["stft"].shape[0] == 1025
+
+def test_compat_matches_librosa_extractors(audio):
+    features = spectral.spectral_features(audio, ["stft", "mfcc"])
+    np.testing.assert_allclose(features["stft"], stft_features(audio), atol=1e-2)
+    np.testing.assert_allclose(features["mfcc"], extract_mfcc_1d(audio), atol=1e-2)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import torch
+from features.gammatonegram import gammatonegram
+from features.kernels import get_kernel
+from features.melspectrogram import MEL_SR, melspectrogram
+from features.stft_features import stft_features
+from features.torch_features import TORCH_FEATURE_PARAMS, TorchFeatureExtractor
+
+REFERENCES = {
+    "melspectrogram": (melspectrogram, MEL_SR),
+    "stft": (stft_features, 22050),
+    "gammatonegram": (gammatonegram, 16000),
+}
+
+def clip(sr, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    return (0.1 * rng.standard_normal(int(seconds * sr))).astype(np.float32)
+
+@pytest.mark.parametrize("mode", sorted(REFERENCES))
+def test_matches_the_features_extractor(mode):
+    reference, sr = REFERENCES[mode]
+    y = clip(sr, 1.0)
+    expected = reference((y, sr))
+    features, frame_lengths = TorchFeatureExtractor(mode)(torch.from_numpy(y), sr=sr)
+    assert features.shape[1:] == expected.shape[-2:]
+    assert int(frame_lengths[0]) == expected.shape[-1]
+    np.testing.assert_allclose(features[0].numpy(), expected.reshape(features.shape[1:]), atol=1e-3)
+
+@pytest.mark.parametrize("mode", ["melspectrogram", "stft"])
+def test_padding_does_not_change_a_clip(mode):
+    sr = TORCH_FEATURE_PARAMS[mode]["sr"]
+    short, long = clip(sr, 0.5, seed=1), clip(sr, 1.0, seed=2)
+    batch = torch.zeros(2, len(long))
+    batch[0, :len(short)] = torch.from_numpy(short)
+    batch[1] = torch.from_numpy(long)
+    extractor = TorchFeatureExtractor(mode)
+    features, frame_lengths = extractor(batch, torch.tensor([len(short), len(long)]))
+    alone, _ = extractor(torch.from_numpy(short))
+    n = int(frame_lengths[0])
+    torch.testing.assert_close(features[0, :, :n], alone[0], atol=1e-3, rtol=0)
+
+def test_gammatone_layer_is_not_the_shared_kernel():
+    extractor = TorchFeatureExtractor("gammatonegram")
+    params = {k: v for k, v in extractor.params.items() if k != "sr"}
+    assert extractor._kernel(16000, torch.device("cpu")) is not get_kernel("gammatone", sr=16000, **params)
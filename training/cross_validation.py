@@ -0,0 +1,176 @@
+import os
+import time
+import json
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from torch.utils.data import DataLoader, Dataset
+from torchvision import models
+from models.resnet_model import ResNetAudio
+from processing.MelSpectrogramDataset import MelSpectrogramDataset
+from processing.SliceBatchSampler import SliceBatchSampler
+from training.resnet_trainer import train_model
+
+REPORT_FILE = "cv_report.json"
+
+class _FoldDataset(Dataset):
+    # Index view of the shared sample tensor: batches are gathered from it, nothing is copied
+    # per fold. Single-channel features are expanded (without a copy) to the channels the model takes.
+    def __init__(self, samples, labels, indices, channels=1):
+        self.samples = samples
+        self.labels = labels
+        self.indices = indices
+        self.channels = channels
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, batch):
+        indices = self.indices[batch]
+        x = self.samples.index_select(0, indices)
+        if self.channels != x.shape[1]:
+            x = x.expand(-1, self.channels, *x.shape[2:])
+        return x, self.labels[indices]
+
+def resnet18_audio(num_classes):
+    """Default model of `run_cross_validation`: `ResNetAudio` on an untrained ResNet-18."""
+    return ResNetAudio(models.resnet18(), num_classes)
+
+def fold_splits(labels, n_folds=10, folds=None, seed=0):
+    """
+    parameters:
+    labels (array-like): Class label of each sample.
+    n_folds (int): Number of folds.
+    folds (array-like, optional): Predefined fold number of each sample (e.g. the `fold` column of
+        the dataset metadata); numbered folds are used in sorted order. If None, samples are
+        assigned to `n_folds` stratified folds at random.
+    seed (int): Seed of the random assignment.
+
+    returns:
+    splits (list): One (train_indices, validation_indices) pair of LongTensors per fold.
+    """
+    labels = np.asarray(labels)
+    if folds is None:
+        rng = np.random.default_rng(seed)
+        folds = np.empty(len(labels), dtype=np.int64)
+        for label in np.unique(labels):
+            members = rng.permutation(np.flatnonzero(labels == label))
+            # Deal each class round-robin from a random starting fold: every fold gets each class's
+            # share within one sample.
+            folds[members] = (np.arange(len(members)) + rng.integers(n_folds)) % n_folds
+    folds = np.asarray(folds)
+    splits = []
+    for fold in np.unique(folds):
+        validation = folds == fold
+        splits.append((torch.from_numpy(np.flatnonzero(~validation)), torch.from_numpy(np.flatnonzero(validation))))
+    return splits
+
+def _run_fold(fold, samples, labels, train_indices, val_indices, num_classes, model_fn, channels,
+              batch_size, num_threads, output_dir, seed, train_kwargs):
+    # Runs in a worker process; `samples` and `labels` arrive as handles to the parent's shared memory.
+    torch.set_num_threads(num_threads)
+    torch.manual_seed(seed + fold)
+    generator = torch.Generator().manual_seed(seed + fold)
+    dataloaders = {
+        'train': DataLoader(_FoldDataset(samples, labels, train_indices, channels), batch_size=None,
+                            sampler=SliceBatchSampler(len(train_indices), batch_size, shuffle=True, generator=generator)),
+        'validation': DataLoader(_FoldDataset(samples, labels, val_indices, channels), batch_size=None,
+                                 sampler=SliceBatchSampler(len(val_indices), batch_size)),
+    }
+    dataset_sizes = {'train': len(train_indices), 'validation': len(val_indices)}
+    history_path = os.path.join(output_dir, f"fold{fold + 1}_history.json")
+    checkpoint_path = os.path.join(output_dir, f"fold{fold + 1}_best_model.pth")
+
+    start = time.perf_counter()
+    train_model(model_fn(num_classes), None, None, None, dataloaders, dataset_sizes, batch_size,
+                history_path=history_path, checkpoint_path=checkpoint_path, **train_kwargs)
+    with open(history_path) as f:
+        history = json.load(f)
+    return {
+        "fold": fold + 1,
+        "train_size": len(train_indices),
+        "validation_size": len(val_indices),
+        "best_val_acc": max(history["val_acc"], default=None),
+        "best_epoch": int(np.argmax(history["val_acc"])) + 1 if history["val_acc"] else None,
+        "final_train_acc": history["train_acc"][-1] if history["train_acc"] else None,
+        "seconds": time.perf_counter() - start,
+        "history": history,
+        "history_path": history_path,
+        "checkpoint_path": checkpoint_path,
+    }
+
+def run_cross_validation(data_dir, output_dir="cv", n_folds=10, folds=None, max_workers=None, threads_per_fold=None,
+                         model_fn=resnet18_audio, channels=3, batch_size=32, num_epochs=40, seed=0,
+                         max_cache_bytes=8 << 30, **train_kwargs):
+    """
+    parameters:
+    data_dir (str): Feature folder read by `MelSpectrogramDataset`.
+    output_dir (str): Folder for the per-fold histories and best checkpoints and the report.
+    n_folds (int): Number of folds when `folds` is not given.
+    folds (array-like, optional): Predefined fold number of each sample, in dataset order.
+    max_workers (int, optional): Number of folds trained at the same time. Defaults to the number
+        of folds, capped by the CPU count.
+    threads_per_fold (int, optional): Intra-op threads of each fold's process. Defaults to the CPU
+        count divided among the concurrent folds.
+    model_fn (callable): Module-level function building a fresh model from the number of classes.
+    channels (int): Input channels the model takes; the single-channel features are expanded to
+        it. The default of 3 matches `ResNetAudio`.
+    batch_size (int): Batch size.
+    num_epochs (int): Epochs per fold.
+    seed (int): Seed of the fold assignment, the shuffling and the weight initialisation.
+    max_cache_bytes (int): Upper bound for the in-memory feature tensor.
+    **train_kwargs: Further options of `train_model`, e.g. `bf16` or `compile_model`. Performance
+        mode is on unless `performance=False` is passed.
+
+    returns:
+    report (dict): Per-fold results (best validation accuracy and epoch, final training accuracy,
+    time, history and checkpoint path) and their mean and standard deviation, also written to
+    `cv_report.json` in `output_dir`.
+
+    The features are read once into a single tensor in shared memory. Every fold is a pair of
+    index tensors over it, and the folds run concurrently in spawned processes that receive
+    the tensor as a shared-memory handle, each limited to its own thread budget.
+    """
+    dataset = MelSpectrogramDataset(data_dir, cache=True, max_cache_bytes=max_cache_bytes)
+    samples = dataset.as_tensor().share_memory_()
+    labels = dataset.label_tensor.clone().share_memory_()
+    num_classes = len(dataset.classes)
+    splits = fold_splits(dataset.labels, n_folds=n_folds, folds=folds, seed=seed)
+
+    cpu_count = os.cpu_count() or 1
+    if max_workers is None:
+        max_workers = min(len(splits), cpu_count)
+    if threads_per_fold is None:
+        threads_per_fold = max(1, cpu_count // max_workers)
+    train_kwargs.setdefault("performance", True)
+    train_kwargs["num_epochs"] = num_epochs
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn")) as executor:
+        futures = [executor.submit(_run_fold, fold, samples, labels, train_indices, val_indices, num_classes,
+                                   model_fn, channels, batch_size, threads_per_fold, output_dir, seed, train_kwargs)
+                   for fold, (train_indices, val_indices) in enumerate(splits)]
+        for future in as_completed(futures):
+            result = future.result()
+            print(f"Fold {result['fold']}: best validation accuracy {result['best_val_acc']:.4f} "
+                  f"(epoch {result['best_epoch']}) in {result['seconds']:.0f}s")
+            results.append(result)
+    results.sort(key=lambda result: result["fold"])
+
+    best_accuracies = np.array([result["best_val_acc"] for result in results], dtype=np.float64)
+    train_accuracies = np.array([result["final_train_acc"] for result in results], dtype=np.float64)
+    report = {
+        "classes": dataset.classes,
+        "n_folds": len(results),
+        "mean_best_val_acc": float(best_accuracies.mean()),
+        "std_best_val_acc": float(best_accuracies.std()),
+        "mean_final_train_acc": float(train_accuracies.mean()),
+        "folds": results,
+    }
+    with open(os.path.join(output_dir, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Mean best validation accuracy over {len(results)} folds: "
+          f"{report['mean_best_val_acc']:.4f} ± {report['std_best_val_acc']:.4f}")
+    return report